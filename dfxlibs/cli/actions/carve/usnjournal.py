@@ -15,10 +15,13 @@
 """
 
 import logging
+from collections import OrderedDict
 
 from dfxlibs.general.baseclasses.file import File
 from dfxlibs.general.baseclasses.timeline import Timeline
-from dfxlibs.windows.usnjournal.usnrecordv2 import USNRecordV2, usn_carver
+from dfxlibs.general.baseclasses.databaseobject import DatabaseBulkWriter
+from dfxlibs.windows.usnjournal.usnrecordv2 import USNRecordV2, NTFS_ROOT_ADDR_SEQ, usn_carver, \
+    USN_INSERT_BATCH_SIZE
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
 
@@ -53,7 +56,7 @@ def carve_usnjournal() -> None:
         _logger.info(f'carving usn journal in partition {partition.part_name}')
 
         try:
-            _, sqlite_files_cur = File.db_open(meta_folder, partition.part_name, False)
+            sqlite_files_con, sqlite_files_cur = File.db_open(meta_folder, partition.part_name, False)
         except IOError:
             # Don't find parents
             sqlite_files_cur = None
@@ -62,49 +65,35 @@ def carve_usnjournal() -> None:
         sqlite_timeline_con, sqlite_timeline_cur = Timeline.db_open(meta_folder, partition.part_name)
 
         parent_folders = {}
-        count = 0
+        parent_lookup_cur = None
+        if sqlite_files_cur is not None:
+            parent_folders = USNRecordV2.load_parent_folders(sqlite_files_cur)  # all directories of the partition
+            if parent_folders is None:
+                # too many directories to keep in memory: look up the parent folders on demand
+                _logger.info('too many directories for prefetching, looking up parent folders on demand')
+                parent_folders = OrderedDict({NTFS_ROOT_ADDR_SEQ: '/'})  # bounded lru cache
+                parent_lookup_cur = File.db_raw_cursor(sqlite_files_con)
+                # one read transaction for all lookups instead of one per query (keeps the lock and page cache)
+                parent_lookup_cur.execute('BEGIN')
+        usn_writer = DatabaseBulkWriter(sqlite_usn_cur, USN_INSERT_BATCH_SIZE)
+        timeline_writer = DatabaseBulkWriter(sqlite_timeline_cur, USN_INSERT_BATCH_SIZE)
         usnrecord: USNRecordV2
         renames_old = dict()
         states_old = dict()
         for usnrecord in partition.carve(usn_carver):
             if sqlite_files_cur is not None:
-                usnrecord.retrieve_parent_folder(parent_folders, sqlite_files_cur)
-            if usnrecord.db_insert(sqlite_usn_cur):
-                count += 1
+                usnrecord.retrieve_parent_folder(parent_folders, parent_lookup_cur)
+            usn_writer.add(usnrecord)
             # State tracking for timeline
-            file_meta = f'{usnrecord.file_addr}-{usnrecord.file_seq}'
-            if file_meta not in states_old:
-                new_states = usnrecord.hr_reason_to_int(usnrecord.reason)
-            else:
-                new_states = ~states_old[file_meta] & usnrecord.hr_reason_to_int(usnrecord.reason)
-            states_old[file_meta] = usnrecord.hr_reason_to_int(usnrecord.reason)
-            if new_states & usnrecord.USN_REASON_FILE_CREATE:
-                tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                              event_type='FILE_CREATE',
-                              message=f'{usnrecord.full_name} created',
-                              param1=usnrecord.name, param2=usnrecord.parent_folder)
-                tl.db_insert(sqlite_timeline_cur)
-            if new_states & usnrecord.USN_REASON_FILE_DELETE:
-                tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                              event_type='FILE_DELETE',
-                              message=f'{usnrecord.full_name} deleted',
-                              param1=usnrecord.name, param2=usnrecord.parent_folder)
-                tl.db_insert(sqlite_timeline_cur)
-            if new_states & usnrecord.USN_REASON_RENAME_OLD_NAME:
-                renames_old[file_meta] = (usnrecord.name, usnrecord.parent_folder, usnrecord.full_name)
-            if new_states & usnrecord.USN_REASON_RENAME_NEW_NAME and file_meta in renames_old:
-                tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                              event_type='FILE_RENAME',
-                              message=f'{renames_old[file_meta][2]} renamed to {usnrecord.full_name}',
-                              param1=usnrecord.name, param2=usnrecord.parent_folder,
-                              param3=renames_old[file_meta][0], param4=renames_old[file_meta][1])
-                tl.db_insert(sqlite_timeline_cur)
-                del renames_old[file_meta]
-            if new_states & usnrecord.USN_REASON_CLOSE:
-                del states_old[file_meta]
+            timeline_writer.extend(usnrecord.timeline_events(states_old, renames_old))
 
+        usn_writer.flush()
+        timeline_writer.flush()
         sqlite_usn_con.commit()
         sqlite_timeline_con.commit()
-        _logger.info(f'{count} usn records added for partition {partition.part_name}')
+        if parent_lookup_cur is not None:
+            # end the read transaction of the file database
+            parent_lookup_cur.connection.rollback()
+        _logger.info(f'{usn_writer.inserted} usn records added for partition {partition.part_name}')
 
     _logger.info('carving usn records finished')
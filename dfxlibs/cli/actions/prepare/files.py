@@ -28,17 +28,22 @@ import pytsk3
 from dfxlibs.general.helpers.db_filter import db_eq, db_lt, db_ge, db_and, db_gt
 from dfxlibs.general.baseclasses.file import File
 from dfxlibs.general.baseclasses.timeline import Timeline
+from dfxlibs.general.baseclasses.databaseobject import DatabaseBulkWriter
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
 
 
 _logger = logging.getLogger(__name__)
 
+FILE_INSERT_BATCH_SIZE = 10000  # number of file and timeline entries inserted at once while scanning
+
 
 def scan_dir(to_scan: List[Tuple[File, List[str]]], sqlite_file_cur: sqlite3.Cursor,
              sqlite_timeline_cur: sqlite3.Cursor) -> Tuple[int, int]:
-    count_insert = 0
-    count_skip = 0
+    # entries are inserted in batches, duplicates (already prepared entries) are skipped by the database
+    file_writer = DatabaseBulkWriter(sqlite_file_cur, FILE_INSERT_BATCH_SIZE)
+    timeline_writer = DatabaseBulkWriter(sqlite_timeline_cur, FILE_INSERT_BATCH_SIZE)
+    count_added = 0
     last_time = time.time()  # for showing progress
     while len(to_scan) > 0:
         item = to_scan.pop()
@@ -48,14 +53,14 @@ def scan_dir(to_scan: List[Tuple[File, List[str]]], sqlite_file_cur: sqlite3.Cur
                 continue
             if time.time() > last_time + 1:
                 # update progress
-                print(f'\r{count_insert + count_skip} files/directories prepared '
-                      f'(inserted: {count_insert} / skipped: {count_skip})...', end='')
+                # staged entries are neither inserted nor skipped yet
+                skipped = count_added - file_writer.inserted - file_writer.pending
+                print(f'\r{count_added} files/directories prepared '
+                      f'(inserted: {file_writer.inserted} / skipped: {skipped})...', end='')
                 last_time = time.time()
             entry.parent_folder = '/' + '/'.join([*parents])
-            if entry.db_insert(sqlite_file_cur):
-                count_insert += 1
-            else:
-                count_skip += 1
+            file_writer.add(entry)
+            count_added += 1
 
             # Timeline
             timestamp = entry.crtime
@@ -64,18 +69,18 @@ def scan_dir(to_scan: List[Tuple[File, List[str]]], sqlite_file_cur: sqlite3.Cur
             if timestamp.timestamp() > 0:
                 timeline = Timeline(timestamp=timestamp, event_source='filesystem', event_type='FILE_CREATE',
                                     message=f'{entry.full_name} created', param1=entry.name, param2=entry.parent_folder)
-                timeline.db_insert(sqlite_timeline_cur)
+                timeline_writer.add(timeline)
 
             for ads in entry.ntfs_ads:
-                if ads.db_insert(sqlite_file_cur):
-                    count_insert += 1
-                else:
-                    count_skip += 1
+                file_writer.add(ads)
+                count_added += 1
 
             if entry.is_dir and entry.allocated:
                 to_scan.append((entry, [*parents, entry.name]))
 
-    return count_insert, count_skip
+    file_writer.flush()
+    timeline_writer.flush()
+    return file_writer.inserted, count_added - file_writer.inserted
 
 
 @register_argument('-pf', '--prepare_files', action='store_true', help='Scan files and directories of all partitions. '
@@ -223,7 +228,7 @@ def hash_files() -> None:
         # open database
         try:
             sqlite_con, sqlite_cur, sqlite_upd_cur = File.db_open(meta_folder, partition.part_name, False,
-                                                                  generate_cursors_num=2)
+                                                                  generate_cursors_num=2, write=True)
         except IOError:
             raise IOError('ERROR: No file database. Use --prepare_files first')
 
@@ -317,7 +322,7 @@ def file_types() -> None:
         # open database
         try:
             sqlite_con, sqlite_cur, sqlite_upd_cur = File.db_open(meta_folder, partition.part_name, False,
-                                                                  generate_cursors_num=2)
+                                                                  generate_cursors_num=2, write=True)
         except IOError:
             raise IOError('ERROR: No file database. Use --prepare_files first')
 
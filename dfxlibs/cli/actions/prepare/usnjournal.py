@@ -21,13 +21,16 @@
 
 import logging
 
-from struct import unpack
+import re
 import time
+from collections import OrderedDict
 import pytsk3
 
 from dfxlibs.general.baseclasses.file import File
 from dfxlibs.general.baseclasses.timeline import Timeline
-from dfxlibs.windows.usnjournal.usnrecordv2 import USNRecordV2
+from dfxlibs.general.baseclasses.databaseobject import DatabaseBulkWriter
+from dfxlibs.windows.usnjournal.usnrecordv2 import USNRecordV2, NTFS_ROOT_ADDR_SEQ, USN_RECORD_HEADER, \
+    USN_INSERT_BATCH_SIZE
 from dfxlibs.general.helpers.db_filter import db_eq, db_and
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
@@ -35,6 +38,12 @@ from dfxlibs.cli.environment import env
 
 _logger = logging.getLogger(__name__)
 
+USN_READ_BUFFER_SIZE = 16 * 1024 * 1024  # journal data read at once
+USN_READ_BUFFER_MIN = 65536  # refill the read buffer if fewer bytes are left (exceeds max. usn record size)
+NON_ZERO_BYTE = re.compile(rb'[^\x00]')
+USN_PAGE_SIZE = 4096  # usn records do not span journal pages
+USN_PROGRESS_CHECK_MASK = 0xfff  # check the time for the progress output every 4096 records
+
 
 @register_argument('-pusn', '--prepare_usn', action='store_true', help='reading ntfs usn journals and stores the '
                                                                        'entries in a sqlite database in the '
@@ -78,76 +87,64 @@ def prepare_usnjournal() -> None:
             continue
         journal.open(partition)
 
-        # find first usn entry
-        # step 1: jump to the middle of the file and check for data, repeat for halfs to get starting area
-        offset = journal.size // 2
-        chunksize = 0
-        for i in range(20):
-            chunksize = journal.size // (2 ** (i + 1))
-            journal.seek(offset)
-            data = journal.read(512).lstrip(b'\0')
-            if data:
-                offset = offset - (chunksize // 2)
+        # find first usn entry: the beginning of the journal is sparse (zeros). Every journal page starts with a
+        # record, so bisect for the first page with data.
+        first_page = 0
+        last_page = (journal.size + USN_PAGE_SIZE - 1) // USN_PAGE_SIZE
+        while first_page < last_page:
+            middle_page = (first_page + last_page) // 2
+            journal.seek(middle_page * USN_PAGE_SIZE)
+            if journal.read(USN_PAGE_SIZE).lstrip(b'\0'):
+                last_page = middle_page
             else:
-                offset = offset + (chunksize // 2)
+                first_page = middle_page + 1
+        journal.seek(first_page * USN_PAGE_SIZE)
 
-        # step 2: fine search for beginning of usn records
-        if offset > chunksize:
-            journal.seek(offset - chunksize)
-        else:
-            journal.seek(0)
         renames_old = dict()
         states_old = dict()
-        while True:
-            data = journal.read(65536).lstrip(b'\0')
-            if data:
-                if journal.tell() - len(data) - 8 < 0:
-                    journal.seek(0)
-                else:
-                    journal.seek(journal.tell() - len(data) - 8)
-                break
-            if offset == journal.tell():
-                break
-            else:
-                offset = journal.tell()
 
         last_time = time.time()  # for showing progress
-        parent_folders = {}  # cache parent_folder searches
-        record_count = 0
+        parent_folders = USNRecordV2.load_parent_folders(sqlite_files_cur)  # all directories of the partition
+        parent_lookup_cur = None
+        if parent_folders is None:
+            # too many directories to keep in memory: look up the parent folders on demand
+            _logger.info('too many directories for prefetching, looking up parent folders on demand')
+            parent_folders = OrderedDict({NTFS_ROOT_ADDR_SEQ: '/'})  # bounded lru cache
+            parent_lookup_cur = File.db_raw_cursor(sqlite_files_con)
+            # one read transaction for all lookups instead of one per query (keeps the lock and page cache)
+            parent_lookup_cur.execute('BEGIN')
+        loop_count = 0  # check the time for the progress only every few records
+        usn_writer = DatabaseBulkWriter(sqlite_usn_cur, USN_INSERT_BATCH_SIZE)
+        timeline_writer = DatabaseBulkWriter(sqlite_timeline_cur, USN_INSERT_BATCH_SIZE)
         cur_pos = journal.tell()
         # align to 8 byte boundary
         if cur_pos % 8 != 0:
             b = journal.read(8 - (cur_pos % 8)).strip(b'\0')
             if b:
                 raise ValueError(f'non-zero bytes while aligning: {b}')
-        read_buffer = journal.read(65536)
+        # bytearray: refills drop the consumed part in place and append the new data (no new buffer per refill)
+        read_buffer = bytearray(journal.read(USN_READ_BUFFER_SIZE))
         read_buffer_offset = 0
+        journal_eof = len(read_buffer) < USN_READ_BUFFER_SIZE
         while True:
-            if len(read_buffer) - read_buffer_offset < 65536:
-                read_buffer = read_buffer[read_buffer_offset:] + journal.read(65536)
+            if not journal_eof and len(read_buffer) - read_buffer_offset < USN_READ_BUFFER_MIN:
+                data = journal.read(USN_READ_BUFFER_SIZE)
+                journal_eof = len(data) < USN_READ_BUFFER_SIZE
+                del read_buffer[:read_buffer_offset]
+                read_buffer += data
                 read_buffer_offset = 0
-            if len(read_buffer) < 8:
+            if len(read_buffer) - read_buffer_offset < 8:
                 break
-            # skip zero bytes
-            if read_buffer[read_buffer_offset:read_buffer_offset+4] == b'\0\0\0\0':
-                read_buffer_offset += 4
+            rec_len, ver_major, ver_minor = USN_RECORD_HEADER.unpack_from(read_buffer, read_buffer_offset)
+            # skip zero bytes: jump to the dword with the next non-zero byte (or to the end of the buffer)
+            if rec_len == 0:
+                non_zero = NON_ZERO_BYTE.search(read_buffer, read_buffer_offset)
+                next_offset = len(read_buffer) if non_zero is None else non_zero.start()
+                read_buffer_offset = next_offset - next_offset % 4
                 continue
-            rec_len, = unpack('<I', read_buffer[read_buffer_offset:read_buffer_offset+4])
-            ver = read_buffer[read_buffer_offset+4:read_buffer_offset+8]
-
-            """# skip zero bytes
-            dword = b'\0\0\0\0'
-            while dword == b'\0\0\0\0':
-                dword = journal.read(4)
-            if len(dword) < 4:
-                break
-            rec_len,  = unpack('<I', dword)
-            ver = journal.read(4)"""
-            ver_major, ver_minor = unpack('<HH', ver)
             if ver_major == 2 and ver_minor == 0:
                 try:
-                    usnrecord: USNRecordV2 = USNRecordV2.from_raw(
-                        read_buffer[read_buffer_offset:read_buffer_offset+rec_len])
+                    usnrecord: USNRecordV2 = USNRecordV2.from_raw_buf(read_buffer, read_buffer_offset, rec_len)
                     read_buffer_offset += rec_len
                     if rec_len % 4 != 0:
                         to_align = 4 - (rec_len % 4)
@@ -161,51 +158,27 @@ def prepare_usnjournal() -> None:
                     continue
 
                 # valid record
-                usnrecord.retrieve_parent_folder(parent_folders, sqlite_files_cur)
-                if usnrecord.db_insert(sqlite_usn_cur):
-                    record_count += 1
+                usnrecord.retrieve_parent_folder(parent_folders, parent_lookup_cur)
+                usn_writer.add(usnrecord)
                 # State tracking for timeline
-                file_meta = f'{usnrecord.file_addr}-{usnrecord.file_seq}'
-                if file_meta not in states_old:
-                    new_states = usnrecord.hr_reason_to_int(usnrecord.reason)
-                else:
-                    new_states = ~states_old[file_meta] & usnrecord.hr_reason_to_int(usnrecord.reason)
-                states_old[file_meta] = usnrecord.hr_reason_to_int(usnrecord.reason)
-                if new_states & usnrecord.USN_REASON_FILE_CREATE:
-                    tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                                  event_type='FILE_CREATE',
-                                  message=f'{usnrecord.full_name} created',
-                                  param1=usnrecord.name, param2=usnrecord.parent_folder)
-                    tl.db_insert(sqlite_timeline_cur)
-                if new_states & usnrecord.USN_REASON_FILE_DELETE:
-                    tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                                  event_type='FILE_DELETE',
-                                  message=f'{usnrecord.full_name} deleted',
-                                  param1=usnrecord.name, param2=usnrecord.parent_folder)
-                    tl.db_insert(sqlite_timeline_cur)
-                if new_states & usnrecord.USN_REASON_RENAME_OLD_NAME:
-                    renames_old[file_meta] = (usnrecord.name, usnrecord.parent_folder, usnrecord.full_name)
-                if new_states & usnrecord.USN_REASON_RENAME_NEW_NAME and file_meta in renames_old:
-                    tl = Timeline(timestamp=usnrecord.timestamp, event_source='usnjournal',
-                                  event_type='FILE_RENAME',
-                                  message=f'{renames_old[file_meta][2]} renamed to {usnrecord.full_name}',
-                                  param1=usnrecord.name, param2=usnrecord.parent_folder,
-                                  param3=renames_old[file_meta][0], param4=renames_old[file_meta][1])
-                    tl.db_insert(sqlite_timeline_cur)
-                    del renames_old[file_meta]
-                if new_states & usnrecord.USN_REASON_CLOSE:
-                    del states_old[file_meta]
+                timeline_writer.extend(usnrecord.timeline_events(states_old, renames_old))
 
             else:
                 read_buffer_offset += 4
-            if time.time() > last_time + 5:
+            loop_count += 1
+            if loop_count & USN_PROGRESS_CHECK_MASK == 0 and time.time() > last_time + 5:
                 # update progress
-                print(f'\r{record_count} records found...', end='')
+                print(f'\r{usn_writer.inserted} records found...', end='')
                 last_time = time.time()
 
         print(f'\r{" "*60}\r', end='')  # delete progress line
+        usn_writer.flush()
+        timeline_writer.flush()
         sqlite_usn_con.commit()
         sqlite_timeline_con.commit()
-        _logger.info(f'{record_count} usn records added for partition {partition.part_name}')
+        if parent_lookup_cur is not None:
+            # end the read transaction of the file database
+            parent_lookup_cur.connection.rollback()
+        _logger.info(f'{usn_writer.inserted} usn records added for partition {partition.part_name}')
 
     _logger.info('preparing usn records finished')
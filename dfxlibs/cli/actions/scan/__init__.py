@@ -13,3 +13,59 @@
     See the License for the specific language governing permissions and
     limitations under the License.
 """
+
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, List
+
+from dfxlibs.general.baseclasses.file import File
+
+SCAN_OUTPUT_BATCH_SIZE = 1000  # number of output lines to write at once
+
+
+def open_file_db(meta_folder: str, part_name: str) -> sqlite3.Cursor:
+    """
+    Open the file database of a partition for scanning.
+
+    :param meta_folder: folder with the meta databases
+    :type meta_folder: str
+    :param part_name: name of the partition
+    :type part_name: str
+    :return: database cursor
+    :rtype: sqlite3.Cursor
+    :raise IOError: if there is no file database for the partition
+    """
+    try:
+        sqlite_files_con, sqlite_files_cur = File.db_open(meta_folder, part_name, False)
+    except IOError:
+        raise IOError(f'ERROR: No file database for {meta_folder}:{part_name}. Use --prepare_files first')
+    return sqlite_files_cur
+
+
+def scan_partitions(worker: Callable[..., List[str]], meta_folder: str, part_names: List[str],
+                    *args) -> int:
+    """
+    Scan partitions in parallel: worker(meta_folder, part_name, *args) is called for every partition in a process
+    pool, so worker has to be a module level function. The matches are written to stdout in partition order.
+
+    :param worker: function scanning a single partition and returning the output lines of the matches
+    :type worker: Callable[..., List[str]]
+    :param meta_folder: folder with the meta databases
+    :type meta_folder: str
+    :param part_names: names of the partitions to scan
+    :type part_names: List[str]
+    :param args: further arguments for the worker
+    :return: number of matches
+    :rtype: int
+    """
+    count = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(len(part_names), os.cpu_count() or 1))) as executor:
+        for matches in executor.map(worker, repeat(meta_folder), part_names, *(repeat(arg) for arg in args)):
+            count += len(matches)
+            # write the matches in blocks instead of one print (and flush) per match
+            for i in range(0, len(matches), SCAN_OUTPUT_BATCH_SIZE):
+                sys.stdout.write(''.join(f'{match}\n' for match in matches[i:i + SCAN_OUTPUT_BATCH_SIZE]))
+    return count
@@ -15,9 +15,11 @@
 """
 
 import logging
+from typing import List
 
 from dfxlibs.general.baseclasses.file import File
-from dfxlibs.general.helpers.db_filter import db_and, db_like, db_eq
+from dfxlibs.general.helpers.db_filter import db_and, db_like, db_eq, db_eq_nocase
+from dfxlibs.cli.actions.scan import open_file_db, scan_partitions
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
 from os.path import isfile
@@ -25,6 +27,31 @@ from os.path import isfile
 _logger = logging.getLogger(__name__)
 
 
+def _scan_partition(meta_folder: str, part_name: str, filename: str) -> List[str]:
+    """
+    Scan the file database of a single partition for the given filename.
+
+    :param meta_folder: folder with the meta databases
+    :type meta_folder: str
+    :param part_name: name of the partition to scan
+    :type part_name: str
+    :param filename: filename to search for (with sql like wildcards)
+    :type filename: str
+    :return: output lines of the matches
+    :rtype: List[str]
+    :raise IOError: if there is no file database for the partition
+    """
+    sqlite_files_cur = open_file_db(meta_folder, part_name)
+
+    if '%' in filename or '_' in filename:
+        name_filter = db_like('name', filename)
+    else:
+        # no wildcards: same (case insensitive) matches as "like", but served by the name index
+        name_filter = db_eq_nocase('name', filename)
+    files = File.db_select(db_cur=sqlite_files_cur, db_filter=name_filter)
+    return [f'{meta_folder}|{part_name}|{file.source}:{file.full_name}' for file in files]
+
+
 @register_argument('-sfn', '--scan_filename',
                    help='scan for matches for given filename. "%%" (any sequence of zero or more characters) and '
                         '"_" (single character) can be used as wildcards', group_id='scan')
@@ -38,16 +65,6 @@ def scan_filename():
         raise AttributeError('ERROR: No image file specified (--image)')
 
     _logger.info('scanning for files')
-    count = 0
-
-    for partition in image.partitions(part_name=part, only_with_filesystem=True):
-        try:
-            sqlite_files_con, sqlite_files_cur = File.db_open(meta_folder, partition.part_name, False)
-        except IOError:
-            raise IOError(f'ERROR: No file database for {meta_folder}:{partition.part_name}. Use --prepare_files first')
-
-        files = File.db_select(db_cur=sqlite_files_cur, db_filter=db_like('name', filename))
-        for file in files:
-            count += 1
-            print(f'{meta_folder}|{partition.part_name}|{file.source}:{file.full_name}')
+    part_names = [partition.part_name for partition in image.partitions(part_name=part, only_with_filesystem=True)]
+    count = scan_partitions(_scan_partition, meta_folder, part_names, filename)
     _logger.info(f'{count} matches found')
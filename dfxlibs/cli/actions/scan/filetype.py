@@ -15,9 +15,11 @@
 """
 
 import logging
+from typing import List
 
 from dfxlibs.general.baseclasses.file import File
 from dfxlibs.general.helpers.db_filter import db_and, db_like, db_eq
+from dfxlibs.cli.actions.scan import open_file_db, scan_partitions
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
 from os.path import isfile
@@ -25,6 +27,26 @@ from os.path import isfile
 _logger = logging.getLogger(__name__)
 
 
+def _scan_partition(meta_folder: str, part_name: str, filetype: str) -> List[str]:
+    """
+    Scan the file database of a single partition for the given filetype.
+
+    :param meta_folder: folder with the meta databases
+    :type meta_folder: str
+    :param part_name: name of the partition to scan
+    :type part_name: str
+    :param filetype: (part of the) filetype to search for
+    :type filetype: str
+    :return: output lines of the matches
+    :rtype: List[str]
+    :raise IOError: if there is no file database for the partition
+    """
+    sqlite_files_cur = open_file_db(meta_folder, part_name)
+
+    files = File.db_select(db_cur=sqlite_files_cur, db_filter=db_like('file_type', f'%{filetype}%'))
+    return [f'{meta_folder}|{part_name}|{file.source}:{file.full_name}|{file.file_type}' for file in files]
+
+
 @register_argument('-sft', '--scan_filetype',
                    help='scan for matches for given filetype', group_id='scan')
 def scan_filetype():
@@ -37,16 +59,6 @@ def scan_filetype():
         raise AttributeError('ERROR: No image file specified (--image)')
 
     _logger.info('scanning for files')
-    count = 0
-
-    for partition in image.partitions(part_name=part, only_with_filesystem=True):
-        try:
-            sqlite_files_con, sqlite_files_cur = File.db_open(meta_folder, partition.part_name, False)
-        except IOError:
-            raise IOError(f'ERROR: No file database for {meta_folder}:{partition.part_name}. Use --prepare_files first')
-
-        files = File.db_select(db_cur=sqlite_files_cur, db_filter=db_like('file_type', f'%{filetype}%'))
-        for file in files:
-            count += 1
-            print(f'{meta_folder}|{partition.part_name}|{file.source}:{file.full_name}|{file.file_type}')
+    part_names = [partition.part_name for partition in image.partitions(part_name=part, only_with_filesystem=True)]
+    count = scan_partitions(_scan_partition, meta_folder, part_names, filetype)
     _logger.info(f'{count} matches found')
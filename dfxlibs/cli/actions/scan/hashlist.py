@@ -15,15 +15,55 @@
 """
 
 import logging
+from typing import List, Dict
 
 from dfxlibs.general.baseclasses.file import File
-from dfxlibs.general.helpers.db_filter import db_and, db_like, db_eq
+from dfxlibs.general.helpers.db_filter import db_and, db_like, db_in
+from dfxlibs.cli.actions.scan import open_file_db, scan_partitions
 from dfxlibs.cli.arguments import register_argument
 from dfxlibs.cli.environment import env
 from os.path import isfile
 
 _logger = logging.getLogger(__name__)
 
+# stay below the sqlite limit for host parameters in a single statement (999 for sqlite < 3.32)
+HASH_QUERY_CHUNK_SIZE = 900
+HASH_FIELDS = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+
+def _scan_partition(meta_folder: str, part_name: str, hashes: List[str]) -> List[str]:
+    """
+    Scan the file database of a single partition for the given hashes. The matches are returned in the order of the
+    hashes.
+
+    :param meta_folder: folder with the meta databases
+    :type meta_folder: str
+    :param part_name: name of the partition to scan
+    :type part_name: str
+    :param hashes: hashes to search for (md5, sha1 or sha256)
+    :type hashes: List[str]
+    :return: output lines of the matches
+    :rtype: List[str]
+    :raise IOError: if there is no file database for the partition
+    """
+    sqlite_files_cur = open_file_db(meta_folder, part_name)
+
+    # group hashes by hash type to query each field with "IN" instead of one query per hash
+    hashes_by_field = {field: [] for field in HASH_FIELDS.values()}
+    for h in dict.fromkeys(hashes):
+        hashes_by_field[HASH_FIELDS[len(h)]].append(h)
+
+    matches: Dict[str, List[str]] = {h: [] for h in hashes}
+    for field, field_hashes in hashes_by_field.items():
+        for i in range(0, len(field_hashes), HASH_QUERY_CHUNK_SIZE):
+            files = File.db_select(db_cur=sqlite_files_cur,
+                                   db_filter=db_in(field, field_hashes[i:i + HASH_QUERY_CHUNK_SIZE]))
+            for file in files:
+                h = getattr(file, field)
+                matches[h].append(f'{h}|{meta_folder}|{part_name}|{file.source}:{file.full_name}')
+    # map the matches back to the hashlist order
+    return [match for h in hashes for match in matches[h]]
+
 
 @register_argument('-shl', '--scan_hashlist',
                    help='scan for matches from given hashlist file (one hash per line)', group_id='scan')
@@ -39,30 +79,11 @@ def scan_hashlist():
         raise AttributeError('ERROR: No image file specified (--image)')
 
     with open(hashlist, 'r') as f:
-        hashes = [h.strip().lower() for h in f.readlines() if len(h.strip()) in [32, 40, 64]]
+        hashes = [h.strip().lower() for h in f.readlines() if len(h.strip()) in HASH_FIELDS]
 
     _logger.info(f'loaded {len(hashes)} hashes')
 
     _logger.info('scanning for hashlist matches')
-    count = 0
-
-    for partition in image.partitions(part_name=part, only_with_filesystem=True):
-        try:
-            sqlite_files_con, sqlite_files_cur = File.db_open(meta_folder, partition.part_name, False)
-        except IOError:
-            raise IOError(f'ERROR: No file database for {meta_folder}:{partition.part_name}. Use --prepare_files first')
-
-        for h in hashes:
-            if len(h) == 32:
-                field = 'md5'
-            elif len(h) == 40:
-                field = 'sha1'
-            elif len(h) == 64:
-                field = 'sha256'
-            else:
-                continue
-            files = File.db_select(db_cur=sqlite_files_cur, db_filter=db_eq(field, h))
-            for file in files:
-                count += 1
-                print(f'{h}|{meta_folder}|{partition.part_name}|{file.source}:{file.full_name}')
+    part_names = [partition.part_name for partition in image.partitions(part_name=part, only_with_filesystem=True)]
+    count = scan_partitions(_scan_partition, meta_folder, part_names, hashes)
     _logger.info(f'{count} matches found')
@@ -23,10 +23,30 @@ from dfxlibs import __version__
 from dfxlibs.cli.environment import env
 
 
+def _parse_ymd(date_str: str) -> datetime:
+    """
+    parse a date in the format YYYY-MM-DD as utc datetime
+
+    :param date_str: date to parse
+    :type date_str: str
+    :return: parsed date
+    :rtype: datetime
+    :raise ValueError: if date_str is not in the format YYYY-MM-DD
+    """
+    if len(date_str) == 10 and date_str[4] == date_str[7] == '-':
+        # fromisoformat accepts more formats than YYYY-MM-DD, so use it for the exact layout only
+        try:
+            return datetime.fromisoformat(date_str).replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+
+
 class Arguments:
     def __init__(self):
         self.groups = {}
         self.group_order = []
+        self.arg_funcs = {}  # argument flag -> action function
 
     def add_group(self, group_id: str, title: str, description: str):
         self.group_order.append(group_id)
@@ -38,6 +58,9 @@ class Arguments:
         group_id = kwargs['group_id']
         del kwargs['group_id']
         self.groups[group_id]['actions'].append({'args': args, 'kwargs': kwargs})
+        if 'func' in kwargs:
+            for arg in args:
+                self.arg_funcs[arg] = kwargs['func']
 
     def get_argument_parser(self) -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser(
@@ -53,25 +76,23 @@ class Arguments:
     def execute_arguments(self):
         if env['args'].analyze_start:
             try:
-                env['args'].analyze_start = datetime.strptime(env['args'].analyze_start, '%Y-%m-%d'
-                                                              ).replace(tzinfo=timezone.utc)
+                env['args'].analyze_start = _parse_ymd(env['args'].analyze_start)
             except ValueError:
                 raise ValueError(f'ERROR: The given analyze_start date {env["args"].analyze_start} is not in the '
                                  f'format YYYY-MM-DD')
 
         if env['args'].analyze_end:
             try:
-                env['args'].analyze_end = datetime.strptime(env['args'].analyze_end, '%Y-%m-%d'
-                                                            ).replace(tzinfo=timezone.utc)
+                env['args'].analyze_end = _parse_ymd(env['args'].analyze_end)
             except ValueError:
                 raise ValueError(f'ERROR: The given analyze_end date {env["args"].analyze_end} is not in the format '
                                  f'YYYY-MM-DD')
 
+        # actions are executed in the order of the command line
         for ordered_arg in sys.argv:
-            for group_id in self.group_order:
-                for action in self.groups[group_id]['actions']:
-                    if ordered_arg in action['args'] and 'func' in action['kwargs']:
-                        action['kwargs']['func']()
+            func = self.arg_funcs.get(ordered_arg)
+            if func is not None:
+                func()
 
 
 arguments = Arguments()
@@ -111,8 +132,5 @@ def register_argument(*args, **kwargs):
     def wrap(func):
         kwargs['func'] = func
         arguments.add_argument(*args, **kwargs)
-        
-        def call_func(*args):
-            func(*args)
-        return call_func
+        return func
     return wrap
@@ -17,28 +17,95 @@
     limitations under the License.
 """
 
-from typing import Dict, List, Any, Tuple, Generator, Union
-from datetime import datetime
+from typing import Dict, List, Any, Tuple, Generator, Union, Callable, Iterable, Optional
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from itertools import chain
+from operator import attrgetter
+from types import MappingProxyType
 import os
 import sqlite3
 import logging
 
+from dfxlibs.general.baseclasses.defaultclass import object_attributes
+
 _logger = logging.getLogger(__name__)
 
 
 classes_type_cache = dict()
+classes_attr_getter_cache = dict()  # class name -> getter for all attribute values
+classes_insert_cache = dict()  # class name -> (insert sql, insert or ignore sql, column converters)
+classes_update_cache = dict()  # (class name, update attributes) -> (update sql, [(attribute, converter)])
+classes_ddl_cache = dict()  # class name -> [create table, *create index]
+classes_decoder_cache = dict()  # (class name, cursor description) -> [(column index, attribute, converter)]
+classes_defaults_cache = dict()  # class name -> (attributes of a default instance, instance has __dict__)
+classes_select_cache = dict()  # (class name, forced index column) -> select query without where clause
+
+# sqlite column types by python type name (datetime gets a TEXT and a REAL _unix column)
+PYTHON_TO_SQLITE_TYPES = MappingProxyType({'str': 'TEXT', 'int': 'BIGINT', 'float': 'REAL', 'bool': 'INT',
+                                           'bytes': 'BLOB'})
+
+DB_SELECT_BATCH_SIZE = 1000  # rows fetched per fetchmany call in db_select
+DB_BULK_WRITER_BATCH_SIZE = 5000  # rows staged by DatabaseBulkWriter before an insert
+
+# connection settings for bulk inserts (see DatabaseObject.db_tune_bulk_insert)
+DB_BULK_INSERT_PRAGMAS = ['PRAGMA journal_mode=WAL',
+                          'PRAGMA synchronous=NORMAL',
+                          'PRAGMA temp_store=MEMORY',
+                          'PRAGMA cache_size=-65536',  # 64 MiB
+                          'PRAGMA mmap_size=268435456']  # 256 MiB
+
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _dt_timestamp(dt: datetime) -> float:
+    """
+    unix timestamp of dt. Same result as dt.timestamp(), but timezone aware datetimes skip the tzinfo handling of
+    timestamp(). Naive datetimes keep the local time semantics of timestamp().
+
+    :param dt: timestamp to convert
+    :type dt: datetime
+    :return: unix timestamp
+    :rtype: float
+    """
+    if dt.tzinfo is None:
+        return dt.timestamp()
+    return (dt - EPOCH_UTC).total_seconds()
+
+
+def _db_to_bool(value: int) -> bool:
+    return value == 1
 
 
 class DatabaseObject:
+    # subclasses may define __slots__ for their attributes (the schema follows the slot order then)
+    __slots__ = ()
+
     def db_fields(self) -> dict[str, Any]:
-        return ({attr: self.__getattribute__(attr)
-                 for attr in self.__dict__
-                 if attr[0] != '_'})
+        return dict(zip(self.db_types(), self._db_attr_getter()(self)))
+
+    def _db_attr_getter(self) -> Callable[['DatabaseObject'], Tuple]:
+        """
+        Cached getter returning the values of all database attributes (in db_types order) as tuple
+
+        :return: attribute getter
+        :rtype: Callable[[DatabaseObject], Tuple]
+        """
+        cls_name = self.__class__.__name__
+        if cls_name not in classes_attr_getter_cache:
+            attrs = tuple(self.db_types())
+            if len(attrs) == 1:
+                # attrgetter returns the bare value for a single attribute
+                single_getter = attrgetter(attrs[0])
+                classes_attr_getter_cache[cls_name] = lambda obj: (single_getter(obj),)
+            else:
+                classes_attr_getter_cache[cls_name] = attrgetter(*attrs)
+        return classes_attr_getter_cache[cls_name]
 
     def db_types(self) -> Dict[str, type]:
         if self.__class__.__name__ not in classes_type_cache:
             classes_type_cache[self.__class__.__name__] = ({attr: type(self.__getattribute__(attr))
-                                                            for attr in self.__dict__
+                                                            for attr in object_attributes(self)
                                                             if attr[0] != '_'})
         return classes_type_cache[self.__class__.__name__]
 
@@ -50,74 +117,113 @@ class DatabaseObject:
     def db_index() -> List[str]:
         return []
 
-    def _db_create_insert(self):
-        db_types = self.db_types()
-        db_values = self.db_fields()
-        insert_pre = f'INSERT INTO {self.__class__.__name__}'
-        insert_fields = []
-        insert_values = []
-        for attr in db_types:
-            if db_types[attr] is datetime:
-                insert_fields.append(attr)
-                insert_values.append(db_values[attr].isoformat())
-                insert_fields.append(f'{attr}_unix')
-                insert_values.append(db_values[attr].timestamp())
-            elif db_types[attr] is bool:
-                insert_fields.append(attr)
-                insert_values.append(int(db_values[attr]))
-            else:
+    @staticmethod
+    def db_composite_index() -> List[Tuple[str, ...]]:
+        return []
+
+    def _db_insert_template(self) -> Tuple[str, str, Tuple[Tuple[int, Any], ...]]:
+        """
+        Cached insert statements (with and without OR IGNORE) and the converters for the statement columns: one
+        (attribute index, converter) pair per column, the index refers to the db_types order and converter is None if
+        the value is inserted unchanged (datetime attributes have two columns: iso format and unix timestamp)
+
+        :return: insert sql, insert or ignore sql, column converters
+        :rtype: Tuple[str, str, Tuple[Tuple[int, Any], ...]]
+        """
+        cls_name = self.__class__.__name__
+        if cls_name not in classes_insert_cache:
+            db_types = self.db_types()
+            insert_fields = []
+            column_converters = []
+            for idx, attr in enumerate(db_types):
                 insert_fields.append(attr)
-                insert_values.append(db_values[attr])
+                if db_types[attr] is datetime:
+                    insert_fields.append(f'{attr}_unix')
+                    column_converters.append((idx, datetime.isoformat))
+                    column_converters.append((idx, _dt_timestamp))
+                elif db_types[attr] is bool:
+                    column_converters.append((idx, int))
+                else:
+                    column_converters.append((idx, None))
+            insert_post = (f'INTO {cls_name} (' + ', '.join(insert_fields) + ') VALUES (' +
+                           ', '.join(['?'] * len(insert_fields)) + ')')
+            classes_insert_cache[cls_name] = (f'INSERT {insert_post}', f'INSERT OR IGNORE {insert_post}',
+                                              tuple(column_converters))
+        return classes_insert_cache[cls_name]
+
+    def _db_insert_values(self) -> Tuple:
+        _, _, column_converters = self._db_insert_template()
+        values = self._db_attr_getter()(self)
+        return tuple([values[idx] if converter is None else converter(values[idx])
+                      for idx, converter in column_converters])
+
+    def _db_create_insert(self, ignore_duplicates: bool = False):
+        insert_sql, insert_ignore_sql, _ = self._db_insert_template()
+        return [insert_ignore_sql if ignore_duplicates else insert_sql, self._db_insert_values()]
+
+    def _db_update_template(self, update_attrs: List[str] = None) -> Tuple[str, List[Tuple[str, Any]]]:
+        """
+        Cached update statement and the ordered attributes with their value converters (None for no conversion).
+        The attributes hold the update values first, followed by the primary key values for the where clause.
 
-        return [f'{insert_pre} (' + ', '.join(insert_fields) + ') VALUES ('+', '.join(['?']*len(insert_values)) + ')',
-                tuple(insert_values)]
+        :param update_attrs: optional list of fields to update (else update all fields)
+        :type update_attrs: List[str]
+        :return: update sql, list of (attribute, converter)
+        :rtype: Tuple[str, List[Tuple[str, Any]]]
+        """
+        cls_name = self.__class__.__name__
+        cache_key = (cls_name, None if update_attrs is None else tuple(update_attrs))
+        if cache_key not in classes_update_cache:
+            db_types = self.db_types()
+            db_pk_fields = frozenset(self.db_primary_key())
+            where_fields = []
+            where_attrs = []
+            update_fields = []
+            update_attrs_conv = []
+            for attr in db_types:
+                if db_types[attr] is datetime:
+                    converter = datetime.isoformat
+                    field = f'{attr}_unix'
+                    if field in db_pk_fields:
+                        where_fields.append(field)
+                        where_attrs.append((attr, _dt_timestamp))
+                    elif update_attrs is None or attr in update_attrs:
+                        update_fields.append(field)
+                        update_attrs_conv.append((attr, _dt_timestamp))
+                elif db_types[attr] is bool:
+                    converter = int
+                else:
+                    converter = None
 
-    def _db_create_update(self, update_attrs=None):
-        db_types = self.db_types()
-        db_values = self.db_fields()
-        db_pk_fields = self.db_primary_key()
-        update_pre = f'UPDATE {self.__class__.__name__} SET'
-        where_fields = []
-        where_values = []
-        update_fields = []
-        update_values = []
-        for attr in db_types:
-            if db_types[attr] is datetime:
-                value = db_values[attr].isoformat()
-                field = f'{attr}_unix'
-                if field in db_pk_fields:
-                    where_fields.append(field)
-                    where_values.append(db_values[attr].timestamp())
+                if attr in db_pk_fields:
+                    where_fields.append(attr)
+                    where_attrs.append((attr, converter))
                 elif update_attrs is None or attr in update_attrs:
-                    update_fields.append(field)
-                    update_values.append(db_values[attr].timestamp())
-            elif db_types[attr] is bool:
-                value = int(db_values[attr])
-            else:
-                value = db_values[attr]
+                    update_fields.append(attr)
+                    update_attrs_conv.append((attr, converter))
 
-            if attr in db_pk_fields:
-                where_fields.append(attr)
-                where_values.append(value)
-            elif update_attrs is None or attr in update_attrs:
-                update_fields.append(attr)
-                update_values.append(value)
+            classes_update_cache[cache_key] = (f'UPDATE {cls_name} SET ' +
+                                               ', '.join([f'{col} = ?' for col in update_fields]) +
+                                               ' WHERE ' + ' AND '.join([f'{col} = ?' for col in where_fields]),
+                                               update_attrs_conv + where_attrs)
+        return classes_update_cache[cache_key]
 
-        return [f'{update_pre} ' +
-                ', '.join([f'{col} = ?' for col in update_fields]) +
-                ' WHERE ' + ' AND '.join([f'{col} = ?' for col in where_fields]),
-                tuple(update_values + where_values)]
+    def _db_create_update(self, update_attrs=None):
+        update_sql, attr_converters = self._db_update_template(update_attrs)
+        return [update_sql,
+                tuple(getattr(self, attr) if converter is None else converter(getattr(self, attr))
+                      for attr, converter in attr_converters)]
 
     def _db_create_table(self):
-        static_mapping_python_to_sqlite = {'str': 'TEXT', 'int': 'BIGINT', 'float': 'REAL', 'bool': 'INT',
-                                           'bytes': 'BLOB'}
+        if self.__class__.__name__ in classes_ddl_cache:
+            return classes_ddl_cache[self.__class__.__name__]
         db_types = self.db_types()
 
         column_definitions = []
         for attribute in db_types:
-            if db_types[attribute].__name__ in static_mapping_python_to_sqlite:
+            if db_types[attribute].__name__ in PYTHON_TO_SQLITE_TYPES:
                 column_definitions.append(f'{attribute} '
-                                          f'{static_mapping_python_to_sqlite[db_types[attribute].__name__]}')
+                                          f'{PYTHON_TO_SQLITE_TYPES[db_types[attribute].__name__]}')
             elif db_types[attribute] is datetime:
                 # special case: create unix timestamp and human readable timestamp
                 column_definitions.append(f'{attribute}_unix REAL')
@@ -149,25 +255,67 @@ class DatabaseObject:
                 create_index.append(f'{create_index_pre}_{index} ON {self.__class__.__name__} ({index})')
             else:
                 create_index.append(f'{create_index_pre}_{index} ON {self.__class__.__name__} ({index})')
+        for columns in self.db_composite_index():
+            create_index.append(f'{create_index_pre}_{"_".join(columns)} ON {self.__class__.__name__} '
+                                f'({", ".join(columns)})')
 
-        return [create_table, *create_index]
+        classes_ddl_cache[self.__class__.__name__] = [create_table, *create_index]
+        return classes_ddl_cache[self.__class__.__name__]
 
-    @classmethod
-    def db_factory(cls, cursor: sqlite3.Cursor, row: List):
-        self = cls()
-        db_types = self.db_types()
-        for idx, col in enumerate(cursor.description):
-            attr = col[0]
-            try:
+    def _db_row_decoder(self, description: Tuple) -> List[Tuple[int, str, Any]]:
+        """
+        Cached decoder for result rows with the given cursor description: list of (column index, attribute,
+        converter) for all columns that are attributes of this class. converter is None if no conversion is needed.
+
+        :param description: cursor description of the result set
+        :type description: Tuple
+        :return: list of (column index, attribute, converter)
+        :rtype: List[Tuple[int, str, Any]]
+        """
+        cache_key = (self.__class__.__name__, description)
+        if cache_key not in classes_decoder_cache:
+            db_types = self.db_types()
+            decoder = []
+            for idx, col in enumerate(description):
+                attr = col[0]
+                if attr not in db_types:
+                    continue
                 if db_types[attr] is datetime:
-                    value = datetime.fromisoformat(row[idx])
+                    decoder.append((idx, attr, datetime.fromisoformat))
                 elif db_types[attr] is bool:
-                    value = row[idx] == 1
+                    decoder.append((idx, attr, _db_to_bool))
                 else:
-                    value = row[idx]
-                setattr(self, attr, value)
-            except KeyError:
-                pass
+                    decoder.append((idx, attr, None))
+            classes_decoder_cache[cache_key] = decoder
+        return classes_decoder_cache[cache_key]
+
+    def _db_post_load(self) -> None:
+        """
+        Hook called by db_factory after an object was loaded from database. db_factory does not call __init__, it
+        copies the attributes of a default instance instead, so classes with mutable attribute defaults have to
+        recreate them here.
+        """
+        pass
+
+    @classmethod
+    def db_factory(cls, cursor: sqlite3.Cursor, row: List):
+        if cls.__name__ not in classes_defaults_cache:
+            default = cls()
+            classes_defaults_cache[cls.__name__] = ({attr: getattr(default, attr)
+                                                     for attr in object_attributes(default)},
+                                                    hasattr(default, '__dict__'))
+        defaults, has_dict = classes_defaults_cache[cls.__name__]
+        self = cls.__new__(cls)
+        values = {attr: row[idx] if converter is None else converter(row[idx])
+                  for idx, attr, converter in self._db_row_decoder(cursor.description)}
+        if has_dict:
+            self.__dict__.update(defaults)
+            self.__dict__.update(values)
+        else:
+            # slotted class
+            for attr, value in defaults.items():
+                setattr(self, attr, values.get(attr, value))
+        self._db_post_load()
         return self
 
     def db_update(self, db_cur: sqlite3.Cursor, update_attrs: List[str] = None):
@@ -197,11 +345,41 @@ class DatabaseObject:
             return False
 
     @classmethod
-    def db_open(cls, meta_folder: str, part: str, create_if_not_exists: bool = True, generate_cursors_num: int = 1) \
-            -> Tuple[Union[sqlite3.Connection, sqlite3.Cursor], ...]:
+    def db_insert_many(cls, db_cur: sqlite3.Cursor, items: Iterable['DatabaseObject']) -> int:
+        """
+        insert multiple items of this class to database with a single executemany call. Items with duplicate primary
+        keys are skipped (like a failed db_insert). items may be a generator, the values are streamed to sqlite
+        without building an intermediate list.
+
+        :param db_cur: database cursor
+        :type db_cur: sqlite3.Cursor
+        :param items: items to insert
+        :type items: Iterable[DatabaseObject]
+        :return: number of inserted items
+        """
+        items = iter(items)
+        first_item = next(items, None)
+        if first_item is None:
+            return 0
+        _, insert_ignore_sql, _ = first_item._db_insert_template()
+        db_cur.executemany(insert_ignore_sql, map(DatabaseObject._db_insert_values, chain((first_item,), items)))
+        return db_cur.rowcount
+
+    @classmethod
+    def db_open(cls, meta_folder: str, part: str, create_if_not_exists: bool = True, generate_cursors_num: int = 1,
+                tuning: str = 'bulk', write: Optional[bool] = None
+                ) -> Tuple[Union[sqlite3.Connection, sqlite3.Cursor], ...]:
         """
         Opens database for objects and returns database connection and cursors as tuple
 
+        Read opens keep the journal mode of the database file and only write opens add indexes missing in databases
+        from older versions. By default an open is a write open if create_if_not_exists is True.
+
+        With tuning 'bulk' a write open is configured for fast ingestion (see db_tune_bulk_insert): write ahead log
+        and synchronous=NORMAL. A committed transaction may be lost on power failure or os crash (not on an
+        application crash), but the database stays consistent. Use 'safe' to keep the sqlite defaults (rollback
+        journal, synchronous=FULL).
+
         :param meta_folder: name of the meta information folder to store/read databases
         :type meta_folder: str
         :param part: partition name in the format "X_Y"
@@ -210,37 +388,110 @@ class DatabaseObject:
         :type create_if_not_exists: bool
         :param generate_cursors_num: generate given number of db cursors and return them
         :type generate_cursors_num: int
+        :param tuning: 'bulk' (default) or 'safe'
+        :type tuning: str
+        :param write: database is opened to write objects, defaults to create_if_not_exists
+        :type write: Optional[bool]
         :return: database connection (first element) and generate_cursors_num cursors
         :rtype: Tuple[Union[sqlite3.Connection, sqlite3.Cursor], ...]
         :raise IOError: if database not exists and create_if_not_exists is False
+        :raise ValueError: on unknown tuning
         """
+        if tuning not in ('bulk', 'safe'):
+            raise ValueError(f'Unknown database tuning: {tuning}')
         file_db = os.path.join(meta_folder, f'{cls.__name__.lower()}_{part}.db')
         exists = os.path.isfile(file_db)
         if not create_if_not_exists and not exists:
             # database required
             raise IOError()
+        if write is None:
+            write = create_if_not_exists
 
         # open database
         sqlite_con = sqlite3.connect(file_db)
         sqlite_con.row_factory = cls.db_factory
+        cursor = sqlite_con.cursor()
         if not exists:
-            cursor = sqlite_con.cursor()
             for create_command in cls()._db_create_table():
                 cursor.execute(create_command)
-            sqlite_con.commit()
             _logger.info(f"create database {file_db}")
+            sqlite_con.commit()
+        elif write:
+            # indexes are created with "IF NOT EXISTS", so databases from older versions get new indexes too
+            _, *create_index = cls()._db_create_table()
+            for create_command in create_index:
+                cursor.execute(create_command)
+            sqlite_con.commit()
+        if write and tuning == 'bulk':
+            cls.db_tune_bulk_insert(sqlite_con)
 
         cursors = [sqlite_con.cursor() for _ in range(generate_cursors_num)]
         return sqlite_con, *cursors
 
+    @staticmethod
+    def db_tune_bulk_insert(db_con: sqlite3.Connection) -> None:
+        """
+        Configure a database connection for bulk inserts: write ahead log with less fsyncs (synchronous=NORMAL),
+        temporary data in memory, a larger page cache and memory mapped reads. Must be called outside of a
+        transaction. db_open calls it on write opens unless tuning is 'safe'.
+
+        :param db_con: database connection
+        :type db_con: sqlite3.Connection
+        """
+        for pragma in DB_BULK_INSERT_PRAGMAS:
+            db_con.execute(pragma)
+
+    @staticmethod
+    def db_raw_cursor(db_con: sqlite3.Connection) -> sqlite3.Cursor:
+        """
+        Cursor without the object row factory of db_open: rows are plain tuples. For queries that only need some
+        columns or aggregates (counts, existence checks, lookups) and do not need full objects.
+
+        :param db_con: database connection from db_open
+        :type db_con: sqlite3.Connection
+        :return: database cursor returning tuples
+        :rtype: sqlite3.Cursor
+        """
+        cursor = db_con.cursor()
+        cursor.row_factory = None
+        return cursor
+
+    @staticmethod
+    @contextmanager
+    def db_transaction(db_con: sqlite3.Connection) -> Generator[sqlite3.Connection, None, None]:
+        """
+        Context manager for an explicit write transaction (BEGIN IMMEDIATE): commits on success and rolls back on
+        exceptions. Inside an already open transaction it does nothing, so the outer transaction keeps control of
+        commit and rollback.
+
+        :param db_con: database connection
+        :type db_con: sqlite3.Connection
+        :return: the database connection
+        :rtype: Generator[sqlite3.Connection, None, None]
+        """
+        if db_con.in_transaction:
+            yield db_con
+            return
+        db_con.execute('BEGIN IMMEDIATE')
+        try:
+            yield db_con
+        except BaseException:
+            db_con.rollback()
+            raise
+        db_con.commit()
+
     @classmethod
     def _db_select(cls, db_cur: sqlite3.Cursor, db_filter: Tuple[str, Tuple] = None, force_index_column=None,
                    order_by=None):
-        query = f'SELECT * FROM {cls.__name__}'
-        if force_index_column:
-            if force_index_column not in cls.db_index():
-                raise AttributeError('Attribute not indexed')
-            query = f'{query} INDEXED BY {cls.__name__}_{force_index_column}'
+        cache_key = (cls.__name__, force_index_column or None)
+        if cache_key not in classes_select_cache:
+            query = f'SELECT * FROM {cls.__name__}'
+            if force_index_column:
+                if force_index_column not in cls.db_index():
+                    raise AttributeError('Attribute not indexed')
+                query = f'{query} INDEXED BY {cls.__name__}_{force_index_column}'
+            classes_select_cache[cache_key] = query
+        query = classes_select_cache[cache_key]
         if order_by is not None:
             order_suffix = f' ORDER BY {order_by}'
         else:
@@ -252,7 +503,8 @@ class DatabaseObject:
 
     @classmethod
     def db_select(cls, db_cur: sqlite3.Cursor, db_filter: Tuple[str, Tuple] = None,
-                  force_index_column: str = None, order_by: str = None) -> Generator:
+                  force_index_column: str = None, order_by: str = None,
+                  batch_size: int = DB_SELECT_BATCH_SIZE) -> Generator:
         """
         Select objects from database and returns a generator to iterate over
 
@@ -264,12 +516,14 @@ class DatabaseObject:
         :type force_index_column: str
         :param order_by: column for ordering results
         :type order_by: str
+        :param batch_size: number of rows to fetch from sqlite at once
+        :type batch_size: int
         :return: returns items from database to iterate over
         :raise AttributeError: if force_index_column is not indexed
         """
         cls._db_select(db_cur, db_filter, force_index_column, order_by)
-        while (item := db_cur.fetchone()) is not None:
-            yield item
+        while items := db_cur.fetchmany(batch_size):
+            yield from items
 
     @classmethod
     def db_select_one(cls, db_cur: sqlite3.Cursor, db_filter: Tuple[str, Tuple] = None,
@@ -288,3 +542,78 @@ class DatabaseObject:
         """
         cls._db_select(db_cur, db_filter, force_index_column)
         return db_cur.fetchone()
+
+
+class DatabaseBulkWriter:
+    """
+    Stages objects of one DatabaseObject class and inserts them in batches (INSERT OR IGNORE like db_insert_many).
+    add only stores the raw attribute values of an object. On flush the staged rows are transposed to columns, every
+    column is converted with one list comprehension of its cached converter and the converted columns are transposed
+    back for executemany.
+
+    usage::
+
+        writer = DatabaseBulkWriter(db_cur)
+        for item in items:
+            writer.add(item)
+        writer.flush()
+        db_con.commit()
+    """
+    def __init__(self, db_cur: sqlite3.Cursor, batch_size: int = DB_BULK_WRITER_BATCH_SIZE):
+        self._db_cur = db_cur
+        self._batch_size = batch_size
+        self._rows: List[Tuple] = []
+        self._attr_getter = None
+        self._column_converters: Tuple[Tuple[int, Any], ...] = ()
+        self._insert_sql = ''
+        self.inserted = 0  # number of inserted rows (duplicates are skipped)
+
+    @property
+    def pending(self) -> int:
+        """
+        number of staged items not inserted yet
+
+        :rtype: int
+        """
+        return len(self._rows)
+
+    def add(self, item: DatabaseObject) -> None:
+        """
+        stage an item for insertion and flush if the batch is full
+
+        :param item: item to insert (all items of a writer must be of the same class)
+        :type item: DatabaseObject
+        """
+        if self._attr_getter is None:
+            self._attr_getter = item._db_attr_getter()
+            _, self._insert_sql, self._column_converters = item._db_insert_template()
+        self._rows.append(self._attr_getter(item))
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def extend(self, items: Iterable[DatabaseObject]) -> None:
+        """
+        stage multiple items for insertion
+
+        :param items: items to insert
+        :type items: Iterable[DatabaseObject]
+        """
+        for item in items:
+            self.add(item)
+
+    def flush(self) -> int:
+        """
+        insert all staged items
+
+        :return: number of inserted items
+        :rtype: int
+        """
+        if not self._rows:
+            return 0
+        attr_columns = list(zip(*self._rows))
+        columns = [attr_columns[idx] if converter is None else [converter(value) for value in attr_columns[idx]]
+                   for idx, converter in self._column_converters]
+        self._rows.clear()
+        self._db_cur.executemany(self._insert_sql, zip(*columns))
+        self.inserted += self._db_cur.rowcount
+        return self._db_cur.rowcount
@@ -15,11 +15,43 @@
     limitations under the License.
 """
 
+from typing import List, Dict, Tuple
+
+classes_repr_slots_cache: Dict[type, Tuple[str, ...]] = {}
+
+
+def object_attributes(obj: object) -> List[str]:
+    """
+    names of all attributes set on obj in definition order: the __slots__ of the class hierarchy (base classes first),
+    followed by the instance __dict__ (if any)
+
+    :param obj: object to inspect
+    :type obj: object
+    :return: attribute names
+    :rtype: List[str]
+    """
+    attrs = []
+    for cls in reversed(type(obj).__mro__):
+        for attr in cls.__dict__.get('__slots__', ()):
+            if attr not in ('__dict__', '__weakref__') and hasattr(obj, attr):
+                attrs.append(attr)
+    attrs.extend(getattr(obj, '__dict__', ()))
+    return attrs
+
 
 class DefaultClass:
+    __slots__ = ()
+
     def __repr__(self):
-        return (f'<{self.__class__.__name__} ' +
-                ' '.join([f'{attr}={repr(self.__getattribute__(attr))}'
-                          for attr in self.__dict__
-                          if self.__getattribute__(attr) is not None and attr[0] != '_']) +
-                ' />')
+        cls = type(self)
+        try:
+            repr_slots = classes_repr_slots_cache[cls]
+        except KeyError:
+            # public slot names of the class hierarchy, the instance __dict__ (if any) is added per call
+            repr_slots = tuple(attr for c in reversed(cls.__mro__) for attr in c.__dict__.get('__slots__', ())
+                               if attr[0] != '_')
+            classes_repr_slots_cache[cls] = repr_slots
+        values = [(attr, getattr(self, attr, None)) for attr in repr_slots]
+        values.extend((attr, value) for attr, value in getattr(self, '__dict__', {}).items() if attr[0] != '_')
+        return f'<{cls.__name__} ' + ' '.join([f'{attr}={value!r}' for attr, value in values if value is not None]) + \
+            ' />'
@@ -16,23 +16,41 @@
 """
 
 import pytsk3
-from typing import TYPE_CHECKING, Optional, Iterator, List
+from typing import TYPE_CHECKING, Optional, Iterator, List, Tuple
 from datetime import datetime, timezone
 import struct
 import logging
 import os
 
-from dfxlibs.general.baseclasses.databaseobject import DatabaseObject
+from dfxlibs.general.baseclasses.databaseobject import DatabaseObject, EPOCH_UTC
 from dfxlibs.general.baseclasses.defaultclass import DefaultClass
-from dfxlibs.general.filesystems.ntfs import NtfsAds, NTFSAttrFileName
+from dfxlibs.general.filesystems.ntfs import NtfsAds, NTFSAttrFileName, NTFS_FILE_NAME_HEADER
 
 if TYPE_CHECKING:
     from dfxlibs.general.baseclasses.partition import Partition
 
 _logger = logging.getLogger(__name__)
 
+FILE_READAHEAD_SIZE = 1024 * 1024  # small sequential reads are served from a window of this size
+
+# pytsk3 constants used for every scanned file
+TSK_FS_NAME_TYPE_DIR = pytsk3.TSK_FS_NAME_TYPE_ENUM.TSK_FS_NAME_TYPE_DIR
+TSK_FS_NAME_TYPE_LNK = pytsk3.TSK_FS_NAME_TYPE_ENUM.TSK_FS_NAME_TYPE_LNK
+TSK_FS_NAME_FLAG_ALLOC = pytsk3.TSK_FS_NAME_FLAG_ENUM.TSK_FS_NAME_FLAG_ALLOC
+TSK_FS_TYPE_NTFS = pytsk3.TSK_FS_TYPE_NTFS
+TSK_FS_ATTR_TYPE_NTFS_FNAME = pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME
+TSK_FS_ATTR_TYPE_NTFS_DATA = pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA
+
 
 class File(DatabaseObject, DefaultClass):
+    # no instance __dict__ (millions of File objects during a file system scan), the public attributes in this order
+    # are the database columns
+    __slots__ = ('_tsk3_file', '_parent_partition', '_as_directory', '_ntfs_ads', '_offset', '_read_buf',
+                 '_read_buf_offset', '_ads_attr_type', '_ads_attr_id',
+                 'meta_addr', 'meta_seq', 'par_addr', 'par_seq', 'is_dir', 'is_link', 'allocated', 'size', 'name',
+                 'extension', 'atime', 'crtime', 'ctime', 'mtime', 'fn_atime', 'fn_crtime', 'fn_ctime', 'fn_mtime',
+                 'parent_folder', 'md5', 'sha1', 'sha256', 'tlsh', 'file_type', 'source')
+
     def __init__(self, tsk3_file: pytsk3.File = None, parent_partition: 'Partition' = None):
         # self._full_name = '/' + path.lstrip('/')
         self._tsk3_file = tsk3_file
@@ -42,6 +60,11 @@ class File(DatabaseObject, DefaultClass):
 
         # file reading
         self._offset = 0
+        self._read_buf = b''
+        self._read_buf_offset = 0
+        # attribute to read, resolved on open() or the first read
+        self._ads_attr_type: Optional[int] = None
+        self._ads_attr_id = -1
 
         # fillable by sleuth kit
         self.meta_addr = -1
@@ -54,14 +77,14 @@ class File(DatabaseObject, DefaultClass):
         self.size = -1
         self.name = ''
         self.extension = ''
-        self.atime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.crtime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.ctime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.mtime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.fn_atime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.fn_crtime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.fn_ctime = datetime.fromtimestamp(0, tz=timezone.utc)
-        self.fn_mtime = datetime.fromtimestamp(0, tz=timezone.utc)
+        self.atime = EPOCH_UTC
+        self.crtime = EPOCH_UTC
+        self.ctime = EPOCH_UTC
+        self.mtime = EPOCH_UTC
+        self.fn_atime = EPOCH_UTC
+        self.fn_crtime = EPOCH_UTC
+        self.fn_ctime = EPOCH_UTC
+        self.fn_mtime = EPOCH_UTC
 
         # external information
         self.parent_folder = ''
@@ -74,74 +97,115 @@ class File(DatabaseObject, DefaultClass):
 
         if tsk3_file is not None:
             self.source = 'filesystem'
-            if tsk3_file.info.name is not None:
-                self.meta_addr = tsk3_file.info.name.meta_addr
-                self.meta_seq = tsk3_file.info.name.meta_seq
-                self.par_addr = tsk3_file.info.name.par_addr
-                self.par_seq = tsk3_file.info.name.par_seq
-                self.name = self._tsk3_file.info.name.name.decode('utf8', errors='backslashreplace')
+            # each info/meta/name access creates a new pytsk3 wrapper object, so fetch them once
+            tsk3_info = tsk3_file.info
+            tsk3_name = tsk3_info.name
+            tsk3_meta = tsk3_info.meta
+            if tsk3_name is not None:
+                self.meta_addr = tsk3_name.meta_addr
+                self.meta_seq = tsk3_name.meta_seq
+                self.par_addr = tsk3_name.par_addr
+                self.par_seq = tsk3_name.par_seq
+                self.name = tsk3_name.name.decode('utf8', errors='backslashreplace')
                 if '.' in self.name:
                     _, self.extension = self.name.rsplit('.', maxsplit=1)
                     self.extension = self.extension.lower()
-                self.is_dir = tsk3_file.info.name.type == pytsk3.TSK_FS_NAME_TYPE_ENUM.TSK_FS_NAME_TYPE_DIR
-                self.is_link = tsk3_file.info.name.type == pytsk3.TSK_FS_NAME_TYPE_ENUM.TSK_FS_NAME_TYPE_LNK
-                self.allocated = tsk3_file.info.name.flags == pytsk3.TSK_FS_NAME_FLAG_ENUM.TSK_FS_NAME_FLAG_ALLOC
-
-            if tsk3_file.info.meta is not None:
-                self.size = tsk3_file.info.meta.size
-                self.meta_addr = tsk3_file.info.meta.addr
-                self.meta_seq = tsk3_file.info.meta.seq
-
-                self.atime = datetime.fromtimestamp(tsk3_file.info.meta.atime + tsk3_file.info.meta.atime_nano / 1e9,
-                                                    tz=timezone.utc)
-                self.crtime = datetime.fromtimestamp(tsk3_file.info.meta.crtime + tsk3_file.info.meta.crtime_nano / 1e9,
-                                                     tz=timezone.utc)
-                self.ctime = datetime.fromtimestamp(tsk3_file.info.meta.ctime + tsk3_file.info.meta.ctime_nano / 1e9,
-                                                    tz=timezone.utc)
-                self.mtime = datetime.fromtimestamp(tsk3_file.info.meta.mtime + tsk3_file.info.meta.mtime_nano / 1e9,
-                                                    tz=timezone.utc)
-                if self._parent_partition.type_id == pytsk3.TSK_FS_TYPE_NTFS:
+                name_type = tsk3_name.type
+                self.is_dir = name_type == TSK_FS_NAME_TYPE_DIR
+                self.is_link = name_type == TSK_FS_NAME_TYPE_LNK
+                self.allocated = tsk3_name.flags == TSK_FS_NAME_FLAG_ALLOC
+
+            if tsk3_meta is not None:
+                self.size = tsk3_meta.size
+                self.meta_addr = tsk3_meta.addr
+                self.meta_seq = tsk3_meta.seq
+
+                self.atime = datetime.fromtimestamp(tsk3_meta.atime + tsk3_meta.atime_nano / 1e9, tz=timezone.utc)
+                self.crtime = datetime.fromtimestamp(tsk3_meta.crtime + tsk3_meta.crtime_nano / 1e9, tz=timezone.utc)
+                self.ctime = datetime.fromtimestamp(tsk3_meta.ctime + tsk3_meta.ctime_nano / 1e9, tz=timezone.utc)
+                self.mtime = datetime.fromtimestamp(tsk3_meta.mtime + tsk3_meta.mtime_nano / 1e9, tz=timezone.utc)
+                if self._parent_partition.type_id == TSK_FS_TYPE_NTFS:
                     # If NTFS -> get FNAME timestamps and ads
                     for attr in tsk3_file:
-                        if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_FNAME:
+                        attr_info = attr.info
+                        attr_type = attr_info.type
+                        if attr_type == TSK_FS_ATTR_TYPE_NTFS_FNAME:
+                            if attr_info.size < NTFS_FILE_NAME_HEADER.size:
+                                # truncated attribute (e.g. orphan records)
+                                continue
                             try:
-                                attr_fname = NTFSAttrFileName(tsk3_file.read_random(0, attr.info.size,
-                                                                                    attr.info.type, attr.info.id))
-                            except (struct.error, UnicodeDecodeError):
+                                attr_fname = NTFSAttrFileName(tsk3_file.read_random(0, attr_info.size,
+                                                                                    attr_type, attr_info.id))
+                            except struct.error:
                                 continue
                             self.fn_crtime = attr_fname.crtime
                             self.fn_mtime = attr_fname.mtime
                             self.fn_ctime = attr_fname.ctime
                             self.fn_atime = attr_fname.atime
-                        if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA and attr.info.name:
-                            self._ntfs_ads.append(NtfsAds(self, attr.info.name.decode('utf8'),
-                                                          attr.info.size, attr.info.id))
+                        elif attr_type == TSK_FS_ATTR_TYPE_NTFS_DATA and attr_info.name:
+                            self._ntfs_ads.append(NtfsAds(self, attr_info.name.decode('utf8'),
+                                                          attr_info.size, attr_info.id))
 
-    @property
-    def entries(self) -> Iterator['File']:
+    def _directory(self) -> Optional[pytsk3.Directory]:
         """
-        Retrieve the child entries for a directory
+        Opens the tsk directory of the file once
 
-        :return: Iterator over File objects
-        :rtype Iterator['File']:
+        :return: tsk directory or None if the file is no allocated directory or cannot be opened as directory
+        :rtype: Optional[pytsk3.Directory]
         :raise IOError: if file object is not connected to an image
         """
         if self._parent_partition is None:
             raise IOError('File object not connected to image. Call open() first.')
         if not self.is_dir or not self.allocated:
-            return
+            return None
 
         if self._as_directory is None:
             try:
                 self._as_directory = self._tsk3_file.as_directory()
             except OSError:
                 _logger.warning(f'cannot open {self.source}:{self.full_name} as directory')
-                return
-        for entry in self._as_directory:
+                return None
+        return self._as_directory
+
+    @property
+    def entries(self) -> Iterator['File']:
+        """
+        Retrieve the child entries for a directory
+
+        :return: Iterator over File objects
+        :rtype Iterator['File']:
+        :raise IOError: if file object is not connected to an image
+        """
+        directory = self._directory()
+        if directory is None:
+            return
+        for entry in directory:
             file = File(entry, self._parent_partition)
             file.source = self.source
             yield file
 
+    def entries_raw(self) -> Iterator[Tuple[int, str, bool, int]]:
+        """
+        Retrieve meta address, name, directory flag and size of the child entries for a directory. This is the fast
+        path for bulk scans which only count or index entries: no File objects are built, so no timestamps,
+        $FILE_NAME attributes or ADS are read.
+
+        :return: Iterator over (meta_addr, name, is_dir, size) tuples, size is -1 for entries without meta data
+        :rtype Iterator[Tuple[int, str, bool, int]]:
+        :raise IOError: if file object is not connected to an image
+        """
+        directory = self._directory()
+        if directory is None:
+            return
+        for entry in directory:
+            tsk3_info = entry.info
+            tsk3_name = tsk3_info.name
+            if tsk3_name is None:
+                continue
+            tsk3_meta = tsk3_info.meta
+            yield (tsk3_name.meta_addr, tsk3_name.name.decode('utf8', errors='backslashreplace'),
+                   tsk3_name.type == TSK_FS_NAME_TYPE_DIR, -1 if tsk3_meta is None else tsk3_meta.size)
+
     def open(self, partition: 'Partition'):
         """
         'Opens' a file. This connects the file entry from the database to the partition of the image for reading the
@@ -163,28 +227,52 @@ class File(DatabaseObject, DefaultClass):
             store_id = int(store_id)
             self._tsk3_file = partition.get_volume_shadow_copy_filesystem(store_id).open_meta(self.meta_addr)
         self._offset = 0
+        self._read_buf = b''
+        self._read_buf_offset = 0
+        self._resolve_ads_attr()
+
+    def _resolve_ads_attr(self) -> None:
+        """
+        Looks up the type and id of the attribute holding the file content once, so that read() does not have to walk
+        the attributes of the file for every call. For NTFS ADS this is the named DATA attribute, otherwise the
+        default attribute.
+
+        :return:
+        """
+        self._ads_attr_type = pytsk3.TSK_FS_ATTR_TYPE_DEFAULT
+        self._ads_attr_id = -1
+        if ':' in self.name and self._tsk3_file is not None:
+            # reading NTFS ADS
+            name, ads = self.name.split(':', maxsplit=1)
+            for attr in self._tsk3_file:
+                if attr.info.type == TSK_FS_ATTR_TYPE_NTFS_DATA and attr.info.name and \
+                        attr.info.name.decode('utf8') == ads:
+                    self._ads_attr_type = attr.info.type
+                    self._ads_attr_id = attr.info.id
+                    break
 
     def seek(self, offset: int, whence: int = os.SEEK_SET):
         """
         Sets the current position in the file.
 
-        :param offset: number of bytes from the beginning of the file
+        :param offset: number of bytes relative to the position given by whence (counted backwards for SEEK_END)
         :type offset: int
         :param whence: This is optional and defaults to 0 which means absolute file positioning, other values are 1
         which means seek relative to the current position and 2 means seek relative to the file's end.
         :type whence: int
         :return:
+        :raise RuntimeError: if whence is unknown
         """
-        if offset < 0 or offset > self.size:
-            raise IOError('offset out of bounds')
         if whence == os.SEEK_SET:
-            self._offset = min(offset, self.size)
+            new_offset = offset
         elif whence == os.SEEK_CUR:
-            self._offset = min(self._offset + offset, self.size)
+            new_offset = self._offset + offset
         elif whence == os.SEEK_END:
-            self._offset = max(0, self.size - offset)
+            new_offset = self.size - offset
         else:
             raise RuntimeError('unknown whence value %s' % whence)
+        # positions outside the file are clamped to its start or end
+        self._offset = 0 if new_offset < 0 else min(new_offset, self.size)
 
     def tell(self) -> int:
         """
@@ -214,38 +302,61 @@ class File(DatabaseObject, DefaultClass):
         if to_read == 0:
             return b''
 
-        attr_type = pytsk3.TSK_FS_ATTR_TYPE_DEFAULT
-        attr_id = -1
-        if ':' in self.name:
-            # reading NTFS ADS
-            name, ads = self.name.split(':', maxsplit=1)
-            for attr in self._tsk3_file:
-                if attr.info.type == pytsk3.TSK_FS_ATTR_TYPE_NTFS_DATA and attr.info.name and \
-                        attr.info.name.decode('utf8') == ads:
-                    attr_type = attr.info.type
-                    attr_id = attr.info.id
-                    break
+        if self._ads_attr_type is None:
+            # not opened via open(), e.g. an ADS file created from the ntfs_ads property
+            self._resolve_ads_attr()
+        attr_type = self._ads_attr_type
+        attr_id = self._ads_attr_id
+
+        buf_start = self._offset - self._read_buf_offset
+        if 0 <= buf_start and buf_start + to_read <= len(self._read_buf):
+            data = self._read_buf[buf_start:buf_start + to_read]
+        elif to_read < FILE_READAHEAD_SIZE:
+            # small reads (e.g. exporting in 512 byte chunks) would cost one read_random each, so read ahead a
+            # window (or the whole file if it is smaller) and serve the following reads from it
+            self._read_buf = self._read_random(self._offset, min(FILE_READAHEAD_SIZE, self.size - self._offset),
+                                               attr_type, attr_id)
+            self._read_buf_offset = self._offset
+            data = self._read_buf[:to_read]
+        else:
+            data = self._read_random(self._offset, to_read, attr_type, attr_id)
+
+        self._offset = self._offset + len(data)
+        return data
 
+    def _read_random(self, offset: int, size: int, attr_type: int, attr_id: int) -> bytes:
+        """
+        Reads size bytes at offset from the file in the image. If the image cannot deliver the data, it is read
+        sector by sector as far as it works.
+
+        :param offset: offset in the file
+        :type offset: int
+        :param size: number of bytes to read
+        :type size: int
+        :param attr_type: type of the attribute to read
+        :type attr_type: int
+        :param attr_id: id of the attribute to read
+        :type attr_id: int
+        :return: data from file, may be shorter than size on read errors
+        :rtype: bytes
+        """
         try:
-            data = self._tsk3_file.read_random(self._offset, to_read, attr_type, attr_id)
+            return self._tsk3_file.read_random(offset, size, attr_type, attr_id)
         except OSError:
             # unable to extract data from image
             # reading sector by sector as far as it works
             data = b''
             read = 0
-            while read < to_read:
-                read_now = min(512, to_read - read)
+            while read < size:
+                read_now = min(512, size - read)
                 try:
-                    data += self._tsk3_file.read_random(self._offset+read, read_now, attr_type, attr_id)
+                    data += self._tsk3_file.read_random(offset+read, read_now, attr_type, attr_id)
                 except OSError:
                     _logger.warning(f'Error while reading {self.source}:{self.full_name}: '
-                                    f'Can only extract {read} of {to_read} bytes')
-                    to_read = read
+                                    f'Can only extract {read} of {size} bytes')
                     break
                 read += read_now
-
-        self._offset = self._offset + to_read
-        return data
+            return data
 
     @property
     def full_name(self):
@@ -267,6 +378,10 @@ class File(DatabaseObject, DefaultClass):
             file_ads = File.from_values(**new_attr)
             yield file_ads
 
+    def _db_post_load(self) -> None:
+        # the ads list of the default instance must not be shared
+        self._ntfs_ads = []
+
     @classmethod
     def from_values(cls, **kwargs):
         self = cls()
@@ -279,6 +394,11 @@ class File(DatabaseObject, DefaultClass):
         return ['meta_addr', 'meta_seq', 'par_addr', 'par_seq', 'name', 'parent_folder', 'md5', 'sha1',
                 'sha256', 'tlsh', 'atime', 'ctime', 'crtime', 'mtime', 'extension', 'file_type']
 
+    @staticmethod
+    def db_composite_index():
+        # parent folder lookups (e.g. usn journal) search directories by meta_addr and meta_seq
+        return [('meta_addr', 'meta_seq', 'is_dir')]
+
     @staticmethod
     def db_primary_key() -> List[str]:
         return ['meta_addr', 'name', 'parent_folder', 'size', 'crtime', 'mtime', 'ctime']
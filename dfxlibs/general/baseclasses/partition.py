@@ -29,12 +29,16 @@ from dfxlibs.general.filesystems.ntfs import VSSStore, BitlockerVolume
 from dfxlibs.general.helpers import bytes_to_hr
 import logging
 from time import time
+from concurrent.futures import ThreadPoolExecutor
 
 if TYPE_CHECKING:
     from dfxlibs.general.image import Image
 
 _logger = logging.getLogger(__name__)
 
+PARTITION_READ_CACHE_SIZE = 1024 * 1024  # small partition reads are served from an aligned window of this size
+CARVE_LOOK_AHEAD_SIZE = 0x1000000  # data after the carve offset the carvers may need, padded with zeros at the end
+
 MBR_PARTITION_TYPES = {
     0x01: 'FAT12',
     0x02: 'XENIX root',
@@ -151,6 +155,8 @@ TSK_FS_TYPE = {
     0x2000: 'EXT4'
 }
 
+MBR_PARTITION_TYPE_ID_RE = re.compile(r'\(0x([0-9a-fA-F]+)\)')  # type id in the description of a tsk partition
+
 
 class PartitionWrapper:
     def __init__(self, source: 'Image', partition_info: pytsk3.TSK_VS_PART_INFO = None):
@@ -165,6 +171,9 @@ class PartitionWrapper:
             self.sector_count = partition_info.len
         self._last_byte_offset = (self.sector_offset + self.sector_count) * self.sector_size
         self._read_byte_offset = 0
+        # aligned window of the partition for small reads (offset relative to the partition start)
+        self._read_cache = b''
+        self._read_cache_offset = 0
 
     @property
     def bytes_size(self) -> int:
@@ -180,10 +189,25 @@ class PartitionWrapper:
         if read_size == 0:
             return b''
 
-        offset = min(self.sector_offset * self.sector_size + self._read_byte_offset, self._last_byte_offset)
+        read_byte_offset = self._read_byte_offset
         self._read_byte_offset += read_size
-        data = self._source.handle.read(offset, read_size)
-        return data
+        if read_size >= PARTITION_READ_CACHE_SIZE:
+            offset = min(self.sector_offset * self.sector_size + read_byte_offset, self._last_byte_offset)
+            return self._source.handle.read(offset, read_size)
+
+        # pyvshadow and pybde read the partition in small blocks, serve them from an aligned window
+        cache_start = read_byte_offset - self._read_cache_offset
+        if 0 <= cache_start and cache_start + read_size <= len(self._read_cache):
+            return self._read_cache[cache_start:cache_start + read_size]
+        window_offset = read_byte_offset - read_byte_offset % PARTITION_READ_CACHE_SIZE
+        window_end = read_byte_offset + read_size
+        window_end += -window_end % PARTITION_READ_CACHE_SIZE
+        window_size = min(window_end, self.bytes_size) - window_offset
+        self._read_cache = self._source.handle.read(self.sector_offset * self.sector_size + window_offset,
+                                                    window_size)
+        self._read_cache_offset = window_offset
+        cache_start = read_byte_offset - window_offset
+        return self._read_cache[cache_start:cache_start + read_size]
 
     def seek(self, offset, whence=os.SEEK_SET):
         if offset < 0 or offset > self.bytes_size:
@@ -234,11 +258,10 @@ class Partition(DefaultClass):
             self.descr = partition_info.desc.decode('utf8')
             self._last_byte_offset = (self.sector_offset + self.sector_count) * self.sector_size
             if self.flags & pytsk3.TSK_VS_PART_FLAG_ALLOC:
-                try:
-                    self.type_id = int(re.search(r'\(0x(.+)\)', self.descr).group(1), 16)
-                    self.descr = MBR_PARTITION_TYPES[self.type_id]
-                except (AttributeError, ValueError, KeyError):
-                    pass
+                type_id_match = MBR_PARTITION_TYPE_ID_RE.search(self.descr)
+                if type_id_match:
+                    self.type_id = int(type_id_match.group(1), 16)
+                    self.descr = MBR_PARTITION_TYPES.get(self.type_id, self.descr)
 
         if self.flags == pytsk3.TSK_VS_PART_FLAG_ALLOC:
             self._decrypted = PartitionWrapper(source, partition_info)
@@ -267,10 +290,7 @@ class Partition(DefaultClass):
                 self.sector_size = self._filesystem.info.dev_bsize
                 self._last_byte_offset = (self.sector_offset + self.sector_count) * self.sector_size
                 self.type_id = self._filesystem.info.ftype
-                try:
-                    self.descr = TSK_FS_TYPE[self.type_id]
-                except KeyError:
-                    pass
+                self.descr = TSK_FS_TYPE.get(self.type_id, self.descr)
         else:
             self._filesystem = None
 
@@ -297,78 +317,100 @@ class Partition(DefaultClass):
         else:
             raise AttributeError('Partition not allocated or filesystem unknown')
 
-    def carve(self, carve_func: Callable[[bytes, int], Iterator[any]]) -> Iterator:
+    def carve(self, carve_func: Callable[[bytearray, int], Iterator[any]]) -> Iterator:
         data_count = 0
         chunk_size_mb = 50
         chunk_size = 1024 * 1024 * chunk_size_mb
-        current_data = b''
+        # bytearray: every round drops the carved part in place and appends the new chunk (no new buffer per round)
+        current_data = bytearray()
         current_offset = 0
         last_round = False
         element_count = 0
         last_print = 0
-        while not last_round:
-            data_chunk = self.read(chunk_size)
-            data_count += 1
-            if not data_chunk:
-                data_chunk = b'\0' * chunk_size
-                last_round = True
-            current_data = current_data[current_offset:] + data_chunk
-            current_offset = 0
-            current_data_len = len(current_data)
-
-            while current_data_len - current_offset > 0xffffff:
-                if last_print + 2 < time():
-                    print(f'\r{bytes_to_hr(data_count * chunk_size)} '
-                          f'({data_count*chunk_size/self.bytes_size*100:.2f}%)/'
-                          f'{element_count} potential findings...          ', end='')
-                    last_print = time()
-                for element in carve_func(current_data, current_offset):
-                    if type(element) is int:
-                        current_offset = element
-                        break
-                    else:
-                        element_count += 1
-                        yield element
+        progress_scale = 100 / self.bytes_size  # percentage of the partition per carved byte
+        # the next chunk is read in the background while the current one is carved. Nothing else reads the image
+        # while carving, and the image libraries release the GIL while reading
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            next_chunk = reader.submit(self.read, chunk_size)
+            while not last_round:
+                data_chunk = next_chunk.result()
+                data_count += 1
+                if not data_chunk:
+                    # zero padding, so that the carvers also get their look ahead for the end of the partition
+                    data_chunk = bytes(CARVE_LOOK_AHEAD_SIZE)
+                    last_round = True
+                else:
+                    next_chunk = reader.submit(self.read, chunk_size)
+                del current_data[:current_offset]
+                current_data += data_chunk
+                current_offset = 0
+                current_data_len = len(current_data)
+
+                while current_data_len - current_offset >= CARVE_LOOK_AHEAD_SIZE:
+                    if last_print + 2 < time():
+                        print(f'\r{bytes_to_hr(data_count * chunk_size)} '
+                              f'({data_count * chunk_size * progress_scale:.2f}%)/'
+                              f'{element_count} potential findings...          ', end='')
+                        last_print = time()
+                    for element in carve_func(current_data, current_offset):
+                        if type(element) is int:
+                            current_offset = element
+                            break
+                        else:
+                            element_count += 1
+                            yield element
         print(f'\r{" " * 70}\r', end='')  # delete progress line
 
+    def _open_vss_volume(self) -> bool:
+        """
+        Opens the volume shadow copy volume of the partition once
+
+        :return: True if the volume shadow copies can be parsed
+        :rtype: bool
+        """
+        if self._vss_volume is None:
+            vss_volume = pyvshadow.volume()
+            try:
+                vss_volume.open_file_object(self)
+            except IOError:
+                return False
+            self._vss_volume = vss_volume
+        return True
+
+    def _get_vss_store(self, store_id: int) -> Tuple[pyvshadow.store, pytsk3.FS_Info]:
+        """
+        Returns a volume shadow copy store and its filesystem, both are created once per store
+
+        :param store_id: index of the store
+        :type store_id: int
+        :return: store and filesystem
+        :rtype: Tuple[pyvshadow.store, pytsk3.FS_Info]
+        """
+        try:
+            return self._vss_store_cache[store_id]
+        except KeyError:
+            store: pyvshadow.store = self._vss_volume.get_store(store_id)
+            self._vss_store_cache[store_id] = (store, pytsk3.FS_Info(VSSStore(store)))
+            return self._vss_store_cache[store_id]
+
     def get_volume_shadow_copy_filesystems(self) -> Tuple[int, pyvshadow.store, Iterator[pytsk3.FS_Info]]:
         if self.type_id != pytsk3.TSK_FS_TYPE_NTFS:
             # NTFS only
             return
-        if self._vss_volume is None:
-            self._vss_volume = pyvshadow.volume()
-            try:
-                self._vss_volume.open_file_object(self)
-            except IOError:
-                self._vss_volume = None
-                _logger.warning(f'Unable to parse volume shadow copies in partition {self.part_name}')
-                return
+        if not self._open_vss_volume():
+            _logger.warning(f'Unable to parse volume shadow copies in partition {self.part_name}')
+            return
         for i in range(self._vss_volume.number_of_stores):
-            if i in self._vss_store_cache:
-                return i, self._vss_store_cache[i][0], self._vss_store_cache[i][1]
-            store: pyvshadow.store = self._vss_volume.get_store(i)
-            filesystem = pytsk3.FS_Info(VSSStore(store))
-            self._vss_store_cache[i] = (store, filesystem)
+            store, filesystem = self._get_vss_store(i)
             yield i, store, filesystem
 
     def get_volume_shadow_copy_filesystem(self, store_id: int) -> pytsk3.FS_Info:
         if self.type_id != pytsk3.TSK_FS_TYPE_NTFS:
             # NTFS only
             raise TypeError('partition has no ntfs filesystem')
-        if self._vss_volume is None:
-            self._vss_volume = pyvshadow.volume()
-            try:
-                self._vss_volume.open_file_object(self)
-            except IOError:
-                self._vss_volume = None
-                raise ValueError('unable to parse volume shadow copy')
-        if store_id in self._vss_store_cache:
-            return self._vss_store_cache[store_id][1]
-
-        store: pyvshadow.store = self._vss_volume.get_store(store_id)
-        filesystem = pytsk3.FS_Info(VSSStore(store))
-        self._vss_store_cache[store_id] = (store, filesystem)
-        return filesystem
+        if not self._open_vss_volume():
+            raise ValueError('unable to parse volume shadow copy')
+        return self._get_vss_store(store_id)[1]
 
     def read(self, size: int = None):
         # special case:
@@ -16,16 +16,18 @@
 """
 
 from typing import List
-from datetime import datetime, timezone
+from datetime import datetime
 from json import dumps, loads
 
 
-from dfxlibs.general.baseclasses.databaseobject import DatabaseObject
+from dfxlibs.general.baseclasses.databaseobject import DatabaseObject, EPOCH_UTC
 from dfxlibs.general.baseclasses.defaultclass import DefaultClass
 
 
 class Timeline(DatabaseObject, DefaultClass):
-    def __init__(self, timestamp: datetime = datetime.fromtimestamp(0, tz=timezone.utc),
+    __slots__ = ('timestamp', 'event_source', 'event_type', 'message', 'param1', 'param2', 'param3', 'param4')
+
+    def __init__(self, timestamp: datetime = EPOCH_UTC,
                  event_source: str = '', event_type: str = '', message: str = '',
                  param1: str = '', param2: str = '', param3: str = '', param4: str = ''):
         self.timestamp = timestamp
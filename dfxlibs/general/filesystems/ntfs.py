@@ -19,14 +19,37 @@
 
 import struct
 import pytsk3
-from datetime import datetime, timezone
-from dfxlibs.windows.helpers import filetime_to_dt
+from datetime import datetime
+from dfxlibs.windows.helpers import filetime_to_dt, EPOCH_AS_FILETIME
+from dfxlibs.general.baseclasses.databaseobject import EPOCH_UTC
 from dfxlibs.general.baseclasses.defaultclass import DefaultClass
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from dfxlibs.general.baseclasses.file import File
 
+# $FILE_NAME attribute up to the name: parent reference, 4 timestamps, sizes, flags, reparse, name length, namespace
+NTFS_FILE_NAME_HEADER = struct.Struct('<7Q2I2B')
+
+
+def filetime_to_dt_or_epoch(filetime: int) -> datetime:
+    """
+    Converts windows filetime to datetime object, filetimes which cannot be converted (before the unix epoch like
+    unset timestamps, or out of range) are returned as the unix epoch
+
+    :param filetime: Windows filetime
+    :type filetime: int
+    :return: filetime as datetime
+    :rtype: datetime.datetime
+    """
+    if filetime < EPOCH_AS_FILETIME:
+        # unset timestamps are common, no exception for them
+        return EPOCH_UTC
+    try:
+        return filetime_to_dt(filetime)
+    except ValueError:
+        return EPOCH_UTC
+
 
 class BitlockerVolume(pytsk3.Img_Info):
     def __init__(self, source):
@@ -34,8 +57,7 @@ class BitlockerVolume(pytsk3.Img_Info):
         super().__init__()
 
     def read(self, offset, size):
-        self._source.seek(offset)
-        return self._source.read(size)
+        return self._source.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._source.get_size()
@@ -47,8 +69,7 @@ class VSSStore(pytsk3.Img_Info):
         super().__init__()
 
     def read(self, offset, size):
-        self._store.seek(offset)
-        return self._store.read(size)
+        return self._store.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._store.get_size()
@@ -65,26 +86,15 @@ class NtfsAds:
 class NTFSAttrFileName(DefaultClass):
     def __init__(self, raw: bytes):
         parent_ref, crtime, mtime, ctime, atime, self.asize, self.size, self.flags, \
-            self.ea_reparse, self.fname_len, self.fname_ns = struct.unpack('<7Q2I2B', raw[:66])
+            self.ea_reparse, self.fname_len, self.fname_ns = NTFS_FILE_NAME_HEADER.unpack_from(raw)
         self.par_seq = parent_ref >> 48
         self.par_addr = parent_ref & 0xffffff
-        self.fname = struct.unpack(f'{self.fname_len*2}s', raw[66:66+self.fname_len*2])[0].decode('utf16')
-        try:
-            self.crtime = filetime_to_dt(crtime)
-        except ValueError:
-            self.crtime = datetime.fromtimestamp(0, tz=timezone.utc)
-
-        try:
-            self.mtime = filetime_to_dt(mtime)
-        except ValueError:
-            self.mtime = datetime.fromtimestamp(0, tz=timezone.utc)
-
-        try:
-            self.ctime = filetime_to_dt(ctime)
-        except ValueError:
-            self.ctime = datetime.fromtimestamp(0, tz=timezone.utc)
-
-        try:
-            self.atime = filetime_to_dt(atime)
-        except ValueError:
-            self.atime = datetime.fromtimestamp(0, tz=timezone.utc)
+        fname_end = NTFS_FILE_NAME_HEADER.size + self.fname_len * 2
+        if len(raw) < fname_end:
+            raise struct.error('file name exceeds the $FILE_NAME attribute')
+        # names may contain unpaired surrogates, which must not cost the timestamps of the attribute
+        self.fname = raw[NTFS_FILE_NAME_HEADER.size:fname_end].decode('utf-16-le', errors='backslashreplace')
+        self.crtime = filetime_to_dt_or_epoch(crtime)
+        self.mtime = filetime_to_dt_or_epoch(mtime)
+        self.ctime = filetime_to_dt_or_epoch(ctime)
+        self.atime = filetime_to_dt_or_epoch(atime)
@@ -21,6 +21,8 @@ from .excelwriter import ExcelWriter
 
 __all__ = ['ExcelWriter', 'bytes_to_hr']
 
+BYTES_HR_LABELS = ('B', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB', 'EiB')  # units of bytes_to_hr
+
 
 def bytes_to_hr(b: int) -> str:
     """
@@ -41,9 +43,6 @@ def bytes_to_hr(b: int) -> str:
     :return: human readable string
     :rtype: str
     """
-    labels = ['B', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB', 'EiB']
-    n = 0
-    while b >= 1024 and n < len(labels) - 1:
-        b /= 1024
-        n += 1
-    return '%.1f%s' % (b, labels[n])
+    # every label covers 10 bits of the size
+    n = min((int(b).bit_length() - 1) // 10, len(BYTES_HR_LABELS) - 1) if b >= 1024 else 0
+    return '%.1f%s' % (b / (1 << (10 * n)), BYTES_HR_LABELS[n])
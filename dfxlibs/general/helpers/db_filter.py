@@ -17,7 +17,8 @@
     limitations under the License.
 """
 
-from typing import Tuple, List
+from typing import Tuple, Iterable
+from itertools import chain
 
 
 def db_and(*args: Tuple[str, Tuple[any]]) -> Tuple[str, Tuple]:
@@ -29,12 +30,8 @@ def db_and(*args: Tuple[str, Tuple[any]]) -> Tuple[str, Tuple]:
     :return: filter value to use in databaseoobjects select and select_one function
     :rtype: Tuple[str, Tuple]
     """
-    filter_strings = []
-    filter_values = ()
-    for param in args:
-        filter_strings.append(param[0])
-        filter_values += param[1]
-    return '(' + ' and '.join(filter_strings) + ')', filter_values
+    filter_values = tuple(chain.from_iterable(param[1] for param in args))
+    return '(' + ' and '.join([param[0] for param in args]) + ')', filter_values
 
 
 def db_or(*args: Tuple[str, Tuple[any]]) -> Tuple[str, Tuple]:
@@ -46,26 +43,23 @@ def db_or(*args: Tuple[str, Tuple[any]]) -> Tuple[str, Tuple]:
     :return: filter value to use in databaseoobjects select and select_one function
     :rtype: Tuple[str, Tuple]
     """
-    filter_strings = []
-    filter_values = ()
-    for param in args:
-        filter_strings.append(param[0])
-        filter_values += param[1]
-    return '(' + ' or '.join(filter_strings) + ')', filter_values
+    filter_values = tuple(chain.from_iterable(param[1] for param in args))
+    return '(' + ' or '.join([param[0] for param in args]) + ')', filter_values
 
 
-def db_in(field: str, value: List) -> Tuple[str, Tuple]:
+def db_in(field: str, value: Iterable) -> Tuple[str, Tuple]:
     """
     creates " in " comparison to use in databaseoobjects select and select_one function
 
     :param field: name of database field
     :type field: str
-    :param value: list of values to filter
-    :type value: List
+    :param value: values to filter
+    :type value: Iterable
     :return: filter value to use in databaseoobjects select and select_one function
     :rtype: Tuple[str, Tuple]
     """
-    return f'{field} IN ({", ".join("?"*len(value))})', (*value,)
+    values = tuple(value)
+    return f'{field} IN ({", ".join(["?"] * len(values))})', values
 
 
 def db_eq(field: str, value: any) -> Tuple[str, Tuple]:
@@ -82,6 +76,21 @@ def db_eq(field: str, value: any) -> Tuple[str, Tuple]:
     return f'{field} = ?', (value, )
 
 
+def db_eq_nocase(field: str, value: str) -> Tuple[str, Tuple]:
+    """
+    creates case insensitive "=" comparison to use in databaseoobjects select and select_one function. Like "like"
+    without wildcards, but can use the "COLLATE NOCASE" index of string fields.
+
+    :param field: name of database field
+    :type field: str
+    :param value: value to filter
+    :type value: str
+    :return: filter value to use in databaseoobjects select and select_one function
+    :rtype: Tuple[str, Tuple]
+    """
+    return f'{field} = ? COLLATE NOCASE', (value, )
+
+
 def db_ne(field: str, value: any) -> Tuple[str, Tuple]:
     """
     creates "!=" comparison to use in databaseoobjects select and select_one function
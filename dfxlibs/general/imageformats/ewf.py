@@ -33,8 +33,7 @@ class Ewf(pytsk3.Img_Info):
         self._ewf_handle.close()
 
     def read(self, offset, size):
-        self._ewf_handle.seek(offset)
-        return self._ewf_handle.read(size)
+        return self._ewf_handle.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._ewf_handle.get_media_size()
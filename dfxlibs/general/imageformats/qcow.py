@@ -33,8 +33,7 @@ class QCow(pytsk3.Img_Info):
         self._qcow_handle.close()
 
     def read(self, offset, size):
-        self._qcow_handle.seek(offset)
-        return self._qcow_handle.read(size)
+        return self._qcow_handle.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._qcow_handle.get_media_size()
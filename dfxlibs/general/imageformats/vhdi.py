@@ -33,8 +33,7 @@ class Vhdi(pytsk3.Img_Info):
         self._qcow_handle.close()
 
     def read(self, offset, size):
-        self._pyvhdi_handle.seek(offset)
-        return self._pyvhdi_handle.read(size)
+        return self._pyvhdi_handle.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._pyvhdi_handle.get_media_size()
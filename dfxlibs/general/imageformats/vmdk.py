@@ -34,8 +34,7 @@ class Vmdk(pytsk3.Img_Info):
         self._vmdk_handle.close()
 
     def read(self, offset, size):
-        self._vmdk_handle.seek(offset)
-        return self._vmdk_handle.read(size)
+        return self._vmdk_handle.read_buffer_at_offset(size, offset)
 
     def get_size(self):
         return self._vmdk_handle.get_media_size()
@@ -38,12 +38,12 @@ logging.getLogger("Evtx").setLevel(logging.ERROR)
 EVTX_CARVER_OFFSET_STEP = 512
 
 
-def evtx_carver(current_data: bytes, current_offset: int) -> Iterator[Union[int, 'EvtxFile']]:
+def evtx_carver(current_data: Union[bytes, bytearray], current_offset: int) -> Iterator[Union[int, 'EvtxFile']]:
     """
     Carving function for evtx records in data buffers.
 
     :param current_data: data buffer
-    :type current_data: bytes
+    :type current_data: Union[bytes, bytearray]
     :param current_offset: current offset in the data buffer to analyse
     :type current_offset: int
     :return: Iterator for carved evtx record or next offset to carve
@@ -18,6 +18,7 @@
 """
 
 from datetime import datetime, timezone
+from functools import lru_cache
 import struct
 
 HUNDREDS_OF_NANOSECONDS = 10e6
@@ -106,6 +107,7 @@ FILE_ATTRIBUTE_DESCRIPTIONS = {
 }
 
 
+@lru_cache(maxsize=4096)
 def hr_file_attribute(file_attribute: int) -> str:
     """
     Returns human readable descriptions for file attributes
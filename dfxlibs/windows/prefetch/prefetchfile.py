@@ -34,12 +34,12 @@ if TYPE_CHECKING:
 PREFETCH_CARVER_OFFSET_STEP = 512
 
 
-def prefetch_carver(current_data: bytes, current_offset: int) -> Iterator[Union[int, 'PrefetchFile']]:
+def prefetch_carver(current_data: Union[bytes, bytearray], current_offset: int) -> Iterator[Union[int, 'PrefetchFile']]:
     """
     Carving function for windows prefetch files in data buffers.
 
     :param current_data: data buffer
-    :type current_data: bytes
+    :type current_data: Union[bytes, bytearray]
     :param current_offset: current offset in the data buffer to analyse
     :type current_offset: int
     :return: Iterator for carved prefetch files or next offset to carve
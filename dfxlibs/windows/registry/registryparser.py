@@ -16,12 +16,21 @@
 
 import logging
 import struct
+from collections import deque
+from io import BytesIO
 from Registry import RegistryParse
 from datetime import datetime, timezone
 from typing import Iterator, Optional
 
+from dfxlibs.general.baseclasses.databaseobject import EPOCH_UTC
 from dfxlibs.windows.registry.registryentry import RegistryEntry
 
+try:
+    # optional: libregf-python parses the hive structures in C
+    import pyregf
+except ImportError:
+    pyregf = None
+
 _logger = logging.getLogger(__name__)
 
 
@@ -113,14 +122,25 @@ def _rebuild_key_path(key: RegistryParse.NKRecord, mount_point: str, recovered:
 
 def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovered: bool = False) \
         -> Iterator[RegistryEntry]:
-    queue = [key]
+    # breadth-first walk with an explicit queue (no recursion, popleft is O(1)). Subkeys are queued with the path of
+    # their parent key, so the path has to be rebuilt from the parent chain only for the first key.
+    queue = deque([(key, None)])
 
-    while len(queue) > 0:
-        key = queue.pop(0)
+    while queue:
+        key, parent = queue.popleft()
 
         # build full key path
         try:
-            path = _rebuild_key_path(key, mount_point, recovered)
+            if parent is None:
+                path = _rebuild_key_path(key, mount_point, recovered)
+                try:
+                    parent, name = path.rsplit('\\', 1)
+                except ValueError:
+                    parent = '\\'
+                    name = path
+            else:
+                name = key.name()
+                path = parent + '\\' + name if parent else name
         except (UnicodeDecodeError, struct.error):
             if recovered:
                 # Broken key
@@ -128,12 +148,6 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
             else:
                 raise
 
-        try:
-            parent, name = path.rsplit('\\', 1)
-        except ValueError:
-            parent = '\\'
-            name = path
-
         # key class
         classname = ''
         try:
@@ -145,16 +159,32 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
             else:
                 continue
 
-        # key default value (value name == "")
-        try:
-            value: Optional[RegistryParse.VKRecord] = None
-            for v in key.values_list().values():
-                try:
-                    if v.name() == '':
-                        value = v
+        # read the value list only once: the default value (value name == "") is part of it
+        values = []
+        if key.values_number() > 0:
+            try:
+                gen_values = key.values_list().values()
+                while True:
+                    try:
+                        value = next(gen_values)
+                    except StopIteration:
                         break
-                except UnicodeDecodeError:
-                    continue
+                    except (RegistryParse.ParseException, struct.error) as e:
+                        if not recovered:
+                            _logger.warning(f'Error while parsing value from {path}/{name}: {str(e)}')
+                        continue
+                    try:
+                        value_name = value.name()
+                    except UnicodeDecodeError:
+                        value_name = '(decode error)'
+                    values.append((value_name, value))
+            except (RegistryParse.ParseException, struct.error) as e:
+                if not recovered:
+                    _logger.warning(f'Error while parsing values from {path}/{name}: {str(e)}')
+
+        # key default value
+        try:
+            value: Optional[RegistryParse.VKRecord] = next((v for n, v in values if n == ''), None)
             if value is None:
                 raise RegistryParse.RegistryStructureDoesNotExist('')
             raw_content = value.raw_data().hex()
@@ -173,7 +203,7 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
             try:
                 timestamp = key.timestamp().replace(tzinfo=timezone.utc)
             except OverflowError:
-                timestamp = datetime.fromtimestamp(0, tz=timezone.utc)
+                timestamp = EPOCH_UTC
 
         regentry = RegistryEntry(timestamp=timestamp,
                                  parent_key=parent,
@@ -188,50 +218,34 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
         yield regentry
 
         # values
-        timestamp = datetime.fromtimestamp(0, tz=timezone.utc)
-        if key.values_number() > 0:
-            try:
-                gen_values = key.values_list().values()
-                while True:
-                    try:
-                        value = next(gen_values)
-                    except StopIteration:
-                        break
-                    except (RegistryParse.ParseException, struct.error) as e:
-                        if not recovered:
-                            _logger.warning(f'Error while parsing value from {path}/{name}: {str(e)}')
-                        continue
-
-                    if recovered:
-                        # if recovering then only values from free cells
-                        d = RegistryParse.HBINCell(value._buf, value.offset() - 4, False)
-                        if not d.is_free():
-                            continue
-                    try:
-                        name = value.name()
-                    except UnicodeDecodeError:
-                        name = '(decode error)'
-                    if name == '':
+        try:
+            for value_name, value in values:
+                if value_name == '':
+                    continue
+                if recovered:
+                    # if recovering then only values from free cells
+                    d = RegistryParse.HBINCell(value._buf, value.offset() - 4, False)
+                    if not d.is_free():
                         continue
-                    try:
-                        raw_content = value.raw_data().hex()
-                    except RegistryParse.RegistryStructureDoesNotExist:
-                        raw_content = '(not exists error)'
-                    content, rtype = get_value_content(value)
-
-                    regentry = RegistryEntry(timestamp=timestamp,
-                                             parent_key=path,
-                                             name=name,
-                                             rtype=rtype,
-                                             parsed_content=content,
-                                             raw_content=raw_content,
-                                             is_key=False,
-                                             deleted=recovered)
-
-                    yield regentry
-            except struct.error as e:
-                if not recovered:
-                    _logger.warning(f'Error while parsing values from {path}/{name}: {str(e)}')
+                try:
+                    raw_content = value.raw_data().hex()
+                except RegistryParse.RegistryStructureDoesNotExist:
+                    raw_content = '(not exists error)'
+                content, rtype = get_value_content(value)
+
+                regentry = RegistryEntry(timestamp=EPOCH_UTC,
+                                         parent_key=path,
+                                         name=value_name,
+                                         rtype=rtype,
+                                         parsed_content=content,
+                                         raw_content=raw_content,
+                                         is_key=False,
+                                         deleted=recovered)
+
+                yield regentry
+        except struct.error as e:
+            if not recovered:
+                _logger.warning(f'Error while parsing values from {path}/{name}: {str(e)}')
 
         if key.subkey_number() > 0:
             try:
@@ -239,7 +253,7 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
                 while True:
                     try:
                         subkey = next(gen_subkeys)
-                        queue.append(subkey)
+                        queue.append((subkey, path))
                     except StopIteration:
                         break
                     except RegistryParse.ParseException as e:
@@ -249,6 +263,141 @@ def walk_registry(key: RegistryParse.NKRecord, mount_point: str = None, recovere
                     _logger.warning(f'Error while parsing subkeys from {path}/{name}: {str(e)}')
 
 
+def _regf_value_record(first_hbin: RegistryParse.HBINBlock, value: 'pyregf.value') -> RegistryParse.VKRecord:
+    """
+    Returns the python-registry VK record of a value found by pyregf. pyregf only walks the keys and value lists, the
+    values are decoded by python-registry like in walk_registry (flagged data length, inline data, data type mask), so
+    both walkers give the same entries.
+
+    :param first_hbin: first hive bin of the hive
+    :type first_hbin: RegistryParse.HBINBlock
+    :param value: value from pyregf
+    :type value: pyregf.value
+    :return: VK record of the value
+    :rtype: RegistryParse.VKRecord
+    :raise RegistryParse.ParseException: if there is no VK record at the offset of the value
+    """
+    # the offset of a pyregf value is the offset of the VK record in the hive (after the cell size)
+    cell = RegistryParse.HBINCell(first_hbin._buf, value.offset - 4, first_hbin)
+    return RegistryParse.VKRecord(first_hbin._buf, value.offset, cell)
+
+
+def walk_registry_regf(key: 'pyregf.key', mount_point: str, hive_reg: RegistryParse.REGFBlock) \
+        -> Iterator[RegistryEntry]:
+    """
+    Walk through the allocated keys and values of a hive opened with pyregf. The entries are the same as the ones from
+    walk_registry.
+
+    :param key: root key of the hive
+    :type key: pyregf.key
+    :param mount_point: mountpoint of the hive
+    :type mount_point: str
+    :param hive_reg: the same hive parsed by python-registry, used to decode the values
+    :type hive_reg: RegistryParse.REGFBlock
+    :return: Iterator for the registry entries
+    :rtype: Iterator[RegistryEntry]
+    """
+    first_hbin = RegistryParse.HBINBlock(hive_reg._buf, hive_reg.first_hbin_offset(), hive_reg)
+    # breadth-first walk like walk_registry, the root key name is replaced with the mountpoint
+    queue = deque([(key, None)])
+
+    while queue:
+        key, parent = queue.popleft()
+
+        if parent is None:
+            path = normalize_key_path(key.name or '', mount_point)
+            try:
+                parent, name = path.rsplit('\\', 1)
+            except ValueError:
+                parent = '\\'
+                name = path
+        else:
+            try:
+                name = key.name or ''
+            except (IOError, UnicodeDecodeError) as e:
+                _logger.warning(f'Error while parsing subkey from {parent}: {str(e)}')
+                continue
+            path = parent + '\\' + name if parent else name
+
+        try:
+            classname = key.class_name or ''
+        except (IOError, UnicodeDecodeError) as e:
+            _logger.warning(f'Error while parsing key from {path}/{name}: {str(e)}')
+            classname = ''
+
+        try:
+            timestamp = RegistryParse.parse_windows_timestamp(key.get_last_written_time_as_integer())
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        except (IOError, OverflowError, ValueError):
+            timestamp = EPOCH_UTC
+
+        values = []
+        for i in range(key.number_of_values):
+            try:
+                value = _regf_value_record(first_hbin, key.get_value(i))
+            except (IOError, RegistryParse.ParseException, struct.error) as e:
+                _logger.warning(f'Error while parsing value from {path}/{name}: {str(e)}')
+                continue
+            try:
+                value_name = value.name()
+            except UnicodeDecodeError:
+                value_name = '(decode error)'
+            values.append((value_name, value))
+
+        # key default value
+        value: Optional[RegistryParse.VKRecord] = next((v for n, v in values if n == ''), None)
+        try:
+            if value is None:
+                raise RegistryParse.RegistryStructureDoesNotExist('')
+            raw_content = value.raw_data().hex()
+            content, rtype = get_value_content(value)
+        except (RegistryParse.ParseException, RegistryParse.RegistryStructureDoesNotExist, struct.error):
+            rtype = 'RegSZ'
+            content = '(value not set)'
+            raw_content = ''
+
+        yield RegistryEntry(timestamp=timestamp,
+                            parent_key=parent,
+                            name=name,
+                            rtype=rtype,
+                            raw_content=raw_content,
+                            parsed_content=content,
+                            is_key=True,
+                            classname=classname)
+
+        # values
+        for value_name, value in values:
+            if value_name == '':
+                continue
+            try:
+                raw_content = value.raw_data().hex()
+            except RegistryParse.RegistryStructureDoesNotExist:
+                raw_content = '(not exists error)'
+            except struct.error as e:
+                _logger.warning(f'Error while parsing value {value_name} from {path}: {str(e)}')
+                continue
+            try:
+                content, rtype = get_value_content(value)
+            except struct.error as e:
+                # data does not fit its type: keep the raw content
+                _logger.warning(f'Error while parsing value {value_name} from {path}: {str(e)}')
+                content, rtype = raw_content, value.data_type_str()
+
+            yield RegistryEntry(timestamp=EPOCH_UTC,
+                                parent_key=path,
+                                name=value_name,
+                                rtype=rtype,
+                                parsed_content=content,
+                                raw_content=raw_content,
+                                is_key=False)
+
+        for i in range(key.number_of_sub_keys):
+            try:
+                queue.append((key.get_sub_key(i), path))
+            except IOError as e:
+                _logger.warning(f'Error while parsing subkey from {path}/{name}: {str(e)}')
+
+
 def recover_keys(hive_reg: RegistryParse.REGFBlock, mount_point: str) -> Iterator['RegistryEntry']:
     for HBIN in hive_reg.hbins():
         for cell in HBIN.cells():
@@ -267,8 +416,32 @@ def recover_keys(hive_reg: RegistryParse.REGFBlock, mount_point: str) -> Iterato
 def parse_registry(hive_buf: bytes, mount_point: str) -> Iterator['RegistryEntry']:
     hive_reg = RegistryParse.REGFBlock(hive_buf, 0, False)
 
-    for reg_entry in walk_registry(hive_reg.first_key(), mount_point):
-        yield reg_entry
+    regf_file = None
+    regf_root_key = None
+    if pyregf is not None:
+        regf_file = pyregf.file()
+        try:
+            regf_file.open_file_object(BytesIO(hive_buf))
+            regf_root_key = regf_file.get_root_key()
+        except IOError as e:
+            _logger.warning(f'pyregf cannot open hive for {mount_point}, using python-registry: {str(e)}')
+
+    try:
+        if regf_root_key is not None:
+            for reg_entry in walk_registry_regf(regf_root_key, mount_point, hive_reg):
+                yield reg_entry
+        else:
+            for reg_entry in walk_registry(hive_reg.first_key(), mount_point):
+                yield reg_entry
+    finally:
+        if regf_file is not None:
+            try:
+                regf_file.close()
+            except IOError:
+                # not opened
+                pass
+
+    # deleted keys and values are always carved with python-registry
 
     for reg_entry in recover_keys(hive_reg, mount_point):
         yield reg_entry
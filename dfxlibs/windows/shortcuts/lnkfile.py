@@ -50,12 +50,12 @@ LNK_CARVER_OFFSET_STEP = 512
 LNK_MAGIC = b'\x4c\0\0\0\x01\x14\x02\0\0\0\0\0\xc0\0\0\0\0\0\0\x46'
 
 
-def lnk_carver(current_data: bytes, current_offset: int) -> Iterator[Union[int, 'LnkFile']]:
+def lnk_carver(current_data: Union[bytes, bytearray], current_offset: int) -> Iterator[Union[int, 'LnkFile']]:
     """
     Carving function for windows lnk files in data buffers.
 
     :param current_data: data buffer
-    :type current_data: bytes
+    :type current_data: Union[bytes, bytearray]
     :param current_offset: current offset in the data buffer to analyse
     :type current_offset: int
     :return: Iterator for carved prefetch files or next offset to carve
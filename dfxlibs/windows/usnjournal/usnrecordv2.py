@@ -15,15 +15,17 @@
     limitations under the License.
 """
 
-from typing import List, Iterator, Union, TYPE_CHECKING
+from typing import List, Iterator, Union, Dict, Tuple, Optional, TYPE_CHECKING
+from collections import OrderedDict
 from datetime import datetime, timezone
-from struct import unpack
+from functools import lru_cache
+from struct import Struct
 
 
 from dfxlibs.general.baseclasses.defaultclass import DefaultClass
 from dfxlibs.general.baseclasses.file import File
+from dfxlibs.general.baseclasses.timeline import Timeline
 from dfxlibs.general.baseclasses.databaseobject import DatabaseObject
-from dfxlibs.general.helpers.db_filter import db_eq, db_and
 from dfxlibs.windows.helpers import MAX_FILETIME, EPOCH_AS_FILETIME, filetime_to_dt, ALL_FILE_ATTRIBUTE, \
     hr_file_attribute
 
@@ -32,46 +34,56 @@ if TYPE_CHECKING:
 
 
 USN_CARVER_OFFSET_STEP = 8
-
-
-def usn_carver(current_data: bytes, current_offset: int) -> Iterator[Union[int, 'USNRecordV2']]:
+USN_CARVER_SCAN_WINDOW = 1024 * 1024  # max bytes to scan for candidates in one call of usn_carver
+USN_V2_SIGNATURE = b'\0\0\2\0\0\0'  # upper bytes of the record length and version 2.0
+USN_INSERT_BATCH_SIZE = 5000  # number of usn records to insert with one executemany
+USN_RECORD_HEADER = Struct('<IHH')  # record length, major version, minor version
+USN_RECORD_V2 = Struct('<LxxHLxxHQQIIIIHH')  # v2 record fields following the header
+# single parent folder lookup (on a File.db_raw_cursor: rows are (name, parent_folder) tuples)
+USN_PARENT_FOLDER_QUERY = 'SELECT name, parent_folder FROM File WHERE meta_addr = ? AND meta_seq = ? AND is_dir = 1 ' \
+                          'LIMIT 1'
+USN_DIRECTORIES_QUERY = 'SELECT meta_addr, meta_seq, name, parent_folder FROM File WHERE is_dir = 1 LIMIT ?'
+USN_PARENT_PREFETCH_LIMIT = 1000000  # max. number of directories to prefetch for the parent folder lookup
+USN_PARENT_CACHE_SIZE = 100000  # max. number of parent folders cached for on demand lookups
+NTFS_ROOT_ADDR_SEQ = (5, 5)  # mft entry and sequence number of the ntfs root directory
+
+
+def usn_carver(current_data: Union[bytes, bytearray], current_offset: int) -> Iterator[Union[int, 'USNRecordV2']]:
     """
     Carving function for usn records in data buffers.
 
     :param current_data: data buffer
-    :type current_data: bytes
+    :type current_data: Union[bytes, bytearray]
     :param current_offset: current offset in the data buffer to analyse
     :type current_offset: int
     :return: Iterator for carved usn record or next offset to carve
     """
-    try:
-        candidate_offset = current_data.index(b'\0\0\2\0\0\0', current_offset, -512)
-    except ValueError:
-        yield len(current_data)-512 + USN_CARVER_OFFSET_STEP
-        return
-
-    if candidate_offset % 8 != 2:
-        yield candidate_offset - candidate_offset % 8 + USN_CARVER_OFFSET_STEP
-        return
-
-    current_offset = candidate_offset-2
-    if current_data[current_offset:current_offset + 2] == b'\0\0' or \
-            current_data[current_offset + 2:current_offset + 8] != b'\0\0\2\0\0\0':
-        # only check V2
-        yield current_offset + USN_CARVER_OFFSET_STEP
-
-    try:
-        rec_len = unpack('<I', current_data[current_offset:current_offset + 4])[0]
-        if rec_len < 60:
-            raise AttributeError
-        usnrecord: USNRecordV2 = USNRecordV2.from_raw(current_data[current_offset:current_offset + rec_len])
-        usnrecord.carved = True
-        yield usnrecord
-        yield current_offset + USN_CARVER_OFFSET_STEP
-        return
-    except AttributeError:
-        pass
-    yield current_offset + USN_CARVER_OFFSET_STEP
+    scan_end = current_offset + USN_CARVER_SCAN_WINDOW
+    search_end = len(current_data) - 512
+    while current_offset < scan_end:
+        candidate_offset = current_data.find(USN_V2_SIGNATURE, current_offset, search_end)
+        if candidate_offset == -1:
+            yield search_end + USN_CARVER_OFFSET_STEP
+            return
+
+        if candidate_offset % 8 != 2:
+            current_offset = candidate_offset - candidate_offset % 8 + USN_CARVER_OFFSET_STEP
+            continue
+
+        current_offset = candidate_offset - 2
+        # only check V2 records with a plausible record length
+        if current_data[current_offset:current_offset + 2] != b'\0\0':
+            try:
+                rec_len, _, _ = USN_RECORD_HEADER.unpack_from(current_data, current_offset)
+                if rec_len < 60:
+                    raise AttributeError
+                usnrecord: USNRecordV2 = USNRecordV2.from_raw_buf(current_data, current_offset, rec_len)
+                usnrecord.carved = True
+                yield usnrecord
+            except AttributeError:
+                pass
+        current_offset += USN_CARVER_OFFSET_STEP
+    yield current_offset
 
 
 class USNRecordV2(DatabaseObject, DefaultClass):
@@ -148,6 +160,9 @@ class USNRecordV2(DatabaseObject, DefaultClass):
         USN_SOURCE_CLIENT_REPLICATION_MANAGEMENT: 'Client_Replication_Managment'
     }
 
+    __slots__ = ('timestamp', 'file_addr', 'file_seq', 'par_addr', 'par_seq', 'usn', 'reason', 'source_info', 'sec_id',
+                 'file_attr', 'name', 'parent_folder', 'carved')
+
     def __init__(self, timestamp: datetime = datetime.fromtimestamp(0, tz=timezone.utc),
                  file_addr: int = -1, file_seq: int = -1, par_addr: int = -1, par_seq: int = -1, usn: int = -1,
                  reason: str = '', source_info: str = '', sec_id: int = -1, file_attr: str = '', name: str = '',
@@ -168,10 +183,28 @@ class USNRecordV2(DatabaseObject, DefaultClass):
 
     @classmethod
     def from_raw(cls, raw: bytes):
-        if len(raw) < 60:
+        return cls.from_raw_buf(raw, 0, len(raw))
+
+    @classmethod
+    def from_raw_buf(cls, buf: Union[bytes, bytearray], offset: int, rec_len: int):
+        """
+        Parse an usn record directly from a data buffer (without copying the record first)
+
+        :param buf: data buffer
+        :type buf: Union[bytes, bytearray]
+        :param offset: offset of the record in the buffer
+        :type offset: int
+        :param rec_len: record length from the record header
+        :type rec_len: int
+        :return: parsed usn record
+        :rtype: USNRecordV2
+        :raise AttributeError: if the data is no valid usn record
+        """
+        rec_len = min(rec_len, len(buf) - offset)
+        if rec_len < 60:
             raise AttributeError(f'Invalid Entry Length')
         file_addr, file_seq, par_addr, par_seq, usn, filetime, reason, source_info, sec_id, file_attr, fn_len, \
-            fn_offset = unpack('<LxxHLxxHQQIIIIHH', raw[8:60])
+            fn_offset = USN_RECORD_V2.unpack_from(buf, offset + USN_RECORD_HEADER.size)
         if filetime < EPOCH_AS_FILETIME or filetime > MAX_FILETIME:
             raise AttributeError(f'Invalid Timestamp {filetime}')
         timestamp = filetime_to_dt(filetime)
@@ -189,10 +222,10 @@ class USNRecordV2(DatabaseObject, DefaultClass):
             raise AttributeError('Invalid SourceInfo')
         if fn_len % 2 != 0 or fn_len == 0:
             raise AttributeError('Invalid filename length')
-        if fn_offset + fn_len > len(raw):
+        if fn_offset + fn_len > rec_len:
             raise AttributeError('Invalid filename length')
         try:
-            fname = raw[fn_offset: fn_offset + fn_len].decode('utf-16')
+            fname = buf[offset + fn_offset: offset + fn_offset + fn_len].decode('utf-16')
         except UnicodeDecodeError:
             raise AttributeError('Invalid filename')
         if '\0' in fname:
@@ -201,38 +234,93 @@ class USNRecordV2(DatabaseObject, DefaultClass):
                    usn=usn, reason=cls.reason_to_hr(reason), source_info=cls._source_to_hr(source_info), sec_id=sec_id,
                    file_attr=hr_file_attribute(file_attr), name=fname)
 
-    def retrieve_parent_folder(self, parent_folder_buffer: dict, sqlite_files_cur: 'sqlite3.Cursor'):
+    @staticmethod
+    def _parent_folder_path(name: str, parent_folder: str) -> str:
         """
-        Try to retrieve parent folder from buffer dict or file database
+        Build the folder path of the usn records for the given parent directory entry
+
+        :param name: name of the parent directory entry from the file database
+        :type name: str
+        :param parent_folder: parent folder of the parent directory entry from the file database
+        :type parent_folder: str
+        :return: full path of the parent directory
+        :rtype: str
+        """
+        if name == '/' and parent_folder == '':
+            # root directory
+            return name
+        elif parent_folder == '/':
+            return parent_folder + name
+        else:
+            return parent_folder + '/' + name
+
+    @classmethod
+    def load_parent_folders(cls, sqlite_files_cur: 'sqlite3.Cursor', max_dirs: int = USN_PARENT_PREFETCH_LIMIT) \
+            -> Optional[Dict[Tuple[int, int], str]]:
+        """
+        Read all directories of the file database at once to get a parent folder buffer for retrieve_parent_folder.
+        If there are several entries for the same meta address and sequence number, the first one wins (like the
+        single lookup in retrieve_parent_folder).
 
-        :param parent_folder_buffer: list of parent folders already searched for (for performance)
-        :type parent_folder_buffer: dict
         :param sqlite_files_cur: cursor to sqlite file database
         :type sqlite_files_cur: sqlite3.Cursor
+        :param max_dirs: maximum number of directory entries to keep in memory
+        :type max_dirs: int
+        :return: dict with (meta_addr, meta_seq) as key and the directory path as value or None if there are more
+                 than max_dirs directory entries (then the parent folders have to be looked up on demand)
+        :rtype: Optional[Dict[Tuple[int, int], str]]
+        """
+        # plain tuples of the needed columns only instead of File objects from the row factory
+        dir_cur = File.db_raw_cursor(sqlite_files_cur.connection)
+        parent_folder_buffer = {NTFS_ROOT_ADDR_SEQ: '/'}
+        dir_count = 0
+        for meta_addr, meta_seq, name, parent_folder in dir_cur.execute(USN_DIRECTORIES_QUERY, (max_dirs + 1, )):
+            dir_count += 1
+            if dir_count > max_dirs:
+                dir_cur.close()
+                return None
+            if (meta_addr, meta_seq) not in parent_folder_buffer:
+                parent_folder_buffer[(meta_addr, meta_seq)] = cls._parent_folder_path(name, parent_folder)
+        dir_cur.close()
+        return parent_folder_buffer
+
+    def retrieve_parent_folder(self, parent_folder_buffer: Dict[Tuple[int, int], str],
+                               sqlite_files_cur: 'sqlite3.Cursor' = None):
+        """
+        Try to retrieve parent folder from buffer dict or file database
+
+        :param parent_folder_buffer: parent folders already searched for (for performance), key is the tuple
+                                     (meta_addr, meta_seq) of the parent folder. An OrderedDict is used as LRU
+                                     cache with max. USN_PARENT_CACHE_SIZE entries.
+        :type parent_folder_buffer: Dict[Tuple[int, int], str]
+        :param sqlite_files_cur: cursor to sqlite file database without row factory (see File.db_raw_cursor). If None,
+                                 only the buffer is used (e.g. if it was prefilled by load_parent_folders)
+        :type sqlite_files_cur: sqlite3.Cursor
         """
         # try to find parent folder
-        parent_addr_seq = f'{self.par_addr}-{self.par_seq}'
-        if parent_addr_seq in parent_folder_buffer:
-            self.parent_folder = parent_folder_buffer[parent_addr_seq]
+        parent_addr_seq = (self.par_addr, self.par_seq)
+        lru = isinstance(parent_folder_buffer, OrderedDict)
+        parent_folder = parent_folder_buffer.get(parent_addr_seq)
+        if parent_folder is not None:
+            self.parent_folder = parent_folder
+            if lru:
+                parent_folder_buffer.move_to_end(parent_addr_seq)
+            return
+        if lru and len(parent_folder_buffer) >= USN_PARENT_CACHE_SIZE:
+            # drop least recently used parent folder
+            parent_folder_buffer.popitem(last=False)
+        if sqlite_files_cur is None:
+            parent_folder_buffer[parent_addr_seq] = ''
         else:
-            # Optimize query (use only key column)
-            parent: File
-            for parent in File.db_select(sqlite_files_cur, db_and(db_eq('meta_addr', self.par_addr),
-                                                                  db_eq('meta_seq', self.par_seq),
-                                                                  db_eq('is_dir', 1)),
-                                         force_index_column='meta_addr'):
-                if parent.name == '/' and parent.parent_folder == '':
-                    # root directory
-                    parent_folder = parent.name
-                elif parent.parent_folder == '/':
-                    parent_folder = parent.parent_folder + parent.name
-                else:
-                    parent_folder = parent.parent_folder + '/' + parent.name
+            # served by the (meta_addr, meta_seq, is_dir) index of the file database
+            sqlite_files_cur.execute(USN_PARENT_FOLDER_QUERY, (self.par_addr, self.par_seq))
+            parent: Optional[Tuple[str, str]] = sqlite_files_cur.fetchone()
+            if parent is None:
+                parent_folder_buffer[parent_addr_seq] = ''
+            else:
+                parent_folder = self._parent_folder_path(*parent)
                 parent_folder_buffer[parent_addr_seq] = parent_folder
                 self.parent_folder = parent_folder
-                break
-            else:
-                parent_folder_buffer[parent_addr_seq] = ''
 
     @property
     def full_name(self):
@@ -243,7 +331,57 @@ class USNRecordV2(DatabaseObject, DefaultClass):
         else:
             return f'{self.parent_folder}/{self.name}'
 
+    def timeline_events(self, states_old: Dict[Tuple[int, int], int],
+                        renames_old: Dict[Tuple[int, int], Tuple[str, str, str]]) -> List[Timeline]:
+        """
+        Track the file states over the usn records and generate timeline events (file create, delete and rename).
+        Has to be called for the records in journal order.
+
+        :param states_old: reason flags of the files (file_addr, file_seq) since the last close, updated by this method
+        :type states_old: Dict[Tuple[int, int], int]
+        :param renames_old: name, parent folder and full name of files (file_addr, file_seq) with pending rename,
+                            updated by this method
+        :type renames_old: Dict[Tuple[int, int], Tuple[str, str, str]]
+        :return: timeline events of this record
+        :rtype: List[Timeline]
+        """
+        events = []
+        file_meta = (self.file_addr, self.file_seq)
+        states = self.hr_reason_to_int(self.reason)
+        if file_meta not in states_old:
+            new_states = states
+        else:
+            new_states = ~states_old[file_meta] & states
+        states_old[file_meta] = states
+        if new_states & self.USN_REASON_FILE_CREATE:
+            tl = Timeline(timestamp=self.timestamp, event_source='usnjournal',
+                          event_type='FILE_CREATE',
+                          message=f'{self.full_name} created',
+                          param1=self.name, param2=self.parent_folder)
+            events.append(tl)
+        if new_states & self.USN_REASON_FILE_DELETE:
+            tl = Timeline(timestamp=self.timestamp, event_source='usnjournal',
+                          event_type='FILE_DELETE',
+                          message=f'{self.full_name} deleted',
+                          param1=self.name, param2=self.parent_folder)
+            events.append(tl)
+        if new_states & self.USN_REASON_RENAME_OLD_NAME:
+            renames_old[file_meta] = (self.name, self.parent_folder, self.full_name)
+        if new_states & self.USN_REASON_RENAME_NEW_NAME and file_meta in renames_old:
+            tl = Timeline(timestamp=self.timestamp, event_source='usnjournal',
+                          event_type='FILE_RENAME',
+                          message=f'{renames_old[file_meta][2]} renamed to {self.full_name}',
+                          param1=self.name, param2=self.parent_folder,
+                          param3=renames_old[file_meta][0], param4=renames_old[file_meta][1])
+            events.append(tl)
+            del renames_old[file_meta]
+        if new_states & self.USN_REASON_CLOSE:
+            del states_old[file_meta]
+        return events
+
+    # only few distinct flag combinations occur, so the conversions are cached (bounded for carved garbage)
     @classmethod
+    @lru_cache(maxsize=4096)
     def reason_to_hr(cls, reason: int):
         result = []
         for flag in cls.USN_REASON_DESCRIPTION:
@@ -252,6 +390,7 @@ class USNRecordV2(DatabaseObject, DefaultClass):
         return ' / '.join(result)
 
     @classmethod
+    @lru_cache(maxsize=4096)
     def hr_reason_to_int(cls, reason: str) -> int:
         result = 0
         for flag in cls.USN_REASON_DESCRIPTION:
@@ -260,6 +399,7 @@ class USNRecordV2(DatabaseObject, DefaultClass):
         return result
 
     @classmethod
+    @lru_cache(maxsize=4096)
     def _source_to_hr(cls, source: int):
         result = []
         for flag in cls.USN_SOURCE_DESCRIPTION:
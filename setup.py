@@ -37,5 +37,8 @@ setup(
         "xmltodict",
         "lnkparse3",
         "python-dateutil"
-    ]
+    ],
+    extras_require={
+        'regf': ['libregf-python']
+    }
 )
@@ -0,0 +1,128 @@
+import struct
+import unittest
+from io import BytesIO
+
+try:
+    import pyregf
+    from Registry import RegistryParse
+    from dfxlibs.windows.registry.registryparser import walk_registry, walk_registry_regf
+except ImportError:
+    pyregf = None
+
+
+class HiveBuilder:
+    """
+    Writes a minimal regf hive with a single hbin. Offsets of the cells are relative to the first hbin as in the hive.
+    """
+    def __init__(self):
+        self.cells = bytearray()
+
+    def cell(self, data: bytes) -> int:
+        size = (len(data) + 4 + 7) & ~7
+        offset = len(self.cells) + 32
+        self.cells += struct.pack('<i', -size) + data + b'\0' * (size - 4 - len(data))
+        return offset
+
+    def value(self, name: str, vtype: int, data: bytes, inline_size: int = None) -> int:
+        name_raw = name.encode('ascii')
+        if inline_size is not None or len(data) <= 4:
+            size = 0x80000000 | (len(data) if inline_size is None else inline_size)
+            data_field = data.ljust(4, b'\0')
+        else:
+            size = len(data)
+            data_field = struct.pack('<I', self.cell(data))
+        return self.cell(b'vk' + struct.pack('<HI', len(name_raw), size) + data_field +
+                         struct.pack('<IHH', vtype, 1 if name_raw else 0, 0) + name_raw)
+
+    def key(self, name: str, parent: int, values: list, subkeys: list, root: bool = False,
+            classname: str = None) -> int:
+        value_list = self.cell(b''.join(struct.pack('<I', v) for v in values)) if values else 0xffffffff
+        subkey_list = 0xffffffff
+        if subkeys:
+            subkey_list = self.cell(b'lf' + struct.pack('<H', len(subkeys)) +
+                                    b''.join(struct.pack('<I', o) + n.encode('ascii')[:4].ljust(4, b'\0')
+                                             for o, n in subkeys))
+        class_offset, class_len = 0xffffffff, 0
+        if classname:
+            raw = classname.encode('utf-16-le')
+            class_offset, class_len = self.cell(raw), len(raw)
+        name_raw = name.encode('ascii')
+        flags = 0x20 | (0x2c if root else 0)
+        nk = b'nk' + struct.pack('<HQIIIIIIIIIIIIIIIHH', flags, 132000000000000000, 0, parent, len(subkeys), 0,
+                                 subkey_list, 0xffffffff, len(values), value_list, 0xffffffff, class_offset,
+                                 0, 0, 0, 0, 0, len(name_raw), class_len) + name_raw
+        return self.cell(nk)
+
+    def set_parent(self, key: int, parent: int):
+        struct.pack_into('<I', self.cells, key - 32 + 4 + 16, parent)
+
+    def build(self, root: int) -> bytes:
+        hbin_size = (len(self.cells) + 32 + 4095) & ~4095
+        free = hbin_size - 32 - len(self.cells)
+        cells = self.cells + (struct.pack('<i', free) + b'\0' * (free - 4) if free else b'')
+        hbin = b'hbin' + struct.pack('<IIIIQI', 0, hbin_size, 0, 0, 0, 0) + cells
+        base = bytearray(4096)
+        base[0:4] = b'regf'
+        struct.pack_into('<IIQIIIIII', base, 4, 1, 1, 132000000000000000, 1, 5, 0, 1, root, hbin_size)
+        struct.pack_into('<I', base, 44, 1)
+        checksum = 0
+        for i in range(0, 508, 4):
+            checksum ^= struct.unpack_from('<I', base, i)[0]
+        struct.pack_into('<I', base, 508, checksum)
+        return bytes(base) + hbin
+
+
+def sample_hive() -> bytes:
+    builder = HiveBuilder()
+    values = [builder.value('', 1, 'root default\0'.encode('utf-16-le')),
+              builder.value('dword', 4, struct.pack('<I', 7)),
+              builder.value('bool', 0x11, b'\x01'),
+              builder.value('emptydword', 4, b'', inline_size=0),
+              builder.value('settings', 0x10000011, b'\x01'),
+              builder.value('bin', 3, bytes(range(20))),
+              builder.value('multi', 7, 'a\0bc\0\0'.encode('utf-16-le')),
+              builder.value('qword', 0xb, struct.pack('<Q', 2 ** 40))]
+    sub = builder.key('Sub', 0, [builder.value('x', 1, 'y\0'.encode('utf-16-le'))], [], classname='cls')
+    root = builder.key('ROOT', 0, values, [(sub, 'Sub')], root=True)
+    builder.set_parent(sub, root)
+    return builder.build(root)
+
+
+def entry_fields(entry) -> tuple:
+    return (entry.parent_key, entry.name, entry.rtype, entry.parsed_content, entry.raw_content, entry.timestamp,
+            entry.is_key, entry.classname)
+
+
+@unittest.skipIf(pyregf is None, 'pyregf and python-registry are required')
+class TestWalkRegistry(unittest.TestCase):
+    def setUp(self):
+        self.hive = sample_hive()
+        self.hive_reg = RegistryParse.REGFBlock(self.hive, 0, False)
+
+    def test_regf_walker_matches_python_registry(self):
+        expected = [entry_fields(e) for e in walk_registry(self.hive_reg.first_key(), 'HKLM\\TEST')]
+        regf_file = pyregf.file()
+        regf_file.open_file_object(BytesIO(self.hive))
+        try:
+            result = [entry_fields(e) for e in walk_registry_regf(regf_file.get_root_key(), 'HKLM\\TEST',
+                                                                  self.hive_reg)]
+        finally:
+            regf_file.close()
+        self.assertEqual(len(expected), 10)
+        self.assertEqual(result, expected)
+
+    def test_values_not_matching_their_type_are_kept(self):
+        entries = {e.name: e for e in walk_registry_regf(self._root_key(), 'HKLM\\TEST', self.hive_reg)}
+        self.assertEqual(entries['bool'].raw_content, '01000000')
+        self.assertEqual(entries['emptydword'].rtype, 'RegDWord')
+        self.assertEqual(entries['settings'].rtype, entries['bool'].rtype)
+
+    def _root_key(self):
+        regf_file = pyregf.file()
+        regf_file.open_file_object(BytesIO(self.hive))
+        self.addCleanup(regf_file.close)
+        return regf_file.get_root_key()
+
+
+if __name__ == '__main__':
+    unittest.main()